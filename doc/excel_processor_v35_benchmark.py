@@ -0,0 +1,729 @@
+#!/usr/bin/env python3
+"""
+物料編碼申請管理系統 V3.5 優化版
+Excel處理器 - 效能基準測試
+
+功能：
+1. 產生合成申請資料
+2. 比較逐列建立資料映射（舊路徑）與預先編譯擷取計畫（新路徑）的速度
+3. 比較逐列擷取與實驗性欄式擷取（columnar）的速度
+4. 量測命令列啟動時間，並檢查重量級套件未在匯入時載入
+5. 比較逐格指定具名樣式與共用樣式快取的儲存格寫入成本（每10萬格）
+6. 轉換、驗證、合併吞吐量與尖峰記憶體（1千至1百萬筆，各寫入引擎）
+7. 以JSON輸出結果，並可與前一版結果比較以偵測效能退化
+
+用法：
+    python excel_processor_v35_benchmark.py --rows 100000
+    python excel_processor_v35_benchmark.py --rows 100000 --benchmarks engines
+    python excel_processor_v35_benchmark.py --benchmarks startup --max-startup-ms 250
+    python excel_processor_v35_benchmark.py --rows 20000 --benchmarks styles
+    python excel_processor_v35_benchmark.py --benchmarks throughput --sizes 1000 10000 100000 1000000 --json v35.json
+    python excel_processor_v35_benchmark.py --benchmarks throughput --json new.json --baseline v35.json --max-regression 0.2
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
+from typing import Any, Dict, Iterable, Iterator, List
+
+from excel_processor_v35_optimized import (
+    MaterialExcelProcessor, UNIT_OPTIONS, _CellStyles, _LazyModule, _peak_memory_mb, xlsxwriter
+)
+
+# 僅實驗性欄式擷取需要
+np = _LazyModule('numpy')
+pd = _LazyModule('pandas')
+
+# 基準測試只輸出結果，不輸出處理器日誌
+logging.getLogger('excel_processor_v35_optimized').setLevel(logging.WARNING)
+
+# 不應在匯入處理器模組時載入的套件（只在需要的動作中延遲載入）
+LAZY_MODULES = ['openpyxl', 'numpy', 'pandas', 'pyarrow', 'xlsxwriter', 'asyncio', 'ijson']
+
+# 合成資料的包裝欄位選項與說明（前端表單的實際選項）
+PACKAGING_CHOICES = {
+    '個別產品包裝': (['塑膠袋', 'PE/PP材質', '產品標籤', '氣泡袋', '吊卡'], ['1PC/塑膠袋', '1SET/吊卡', '印刷回收標誌04 PE-LD']),
+    '配件內容': (['螺絲', '螺帽', '墊片', '說明書'], ['附M4x25mm螺絲2顆', '附安裝說明書', '']),
+    '配件': (['安裝模板', '緩衝墊'], ['', '另附安裝模板']),
+    '內盒': (['印製ITEM NO.', '印製數量', '白盒'], ['內盒印製產品編號及數量', '10PCS/內盒', '']),
+    '外箱': (['瓦楞紙箱', '側嘜', '正嘜'], ['5層瓦楞紙箱', '側嘜印製客戶編號', '每箱不超過20kg']),
+    '運輸與托盤要求': (['托盤/Pallet', 'EUDR文件', '纏繞膜'], ['歐規托盤', '出貨提供EUDR文件', '']),
+    '裝櫃要求': (['20呎櫃', '40呎櫃', '併櫃'], ['標準40呎貨櫃', '']),
+    '其他說明': (['FSC認證', 'RoHS', 'REACH'], ['供應商需具備FSC認證', '無', ''])
+}
+
+MATERIALS = ['Zinc Alloy', 'Aluminum', 'Stainless Steel 304', 'Cold Rolled Steel', 'Brass', 'ABS', 'Nylon']
+SURFACE_FINISHES = ['Chrome Plated', 'Brushed Nickel', 'Matte Black', 'Powder Coated', 'Anodized', 'Zinc Plated']
+
+# 各類別的外型尺寸範圍（mm / g）：長、寬、高、重量
+DIMENSION_RANGES = {
+    'H': ((64, 640), (10, 40), (20, 45), (20, 600)),
+    'S': ((250, 700), (12, 50), (35, 60), (300, 2500)),
+    'M': ((300, 1200), (200, 900), (50, 400), (800, 15000)),
+    'D': ((20, 300), (10, 120), (2, 30), (5, 400)),
+    'F': ((30, 400), (20, 200), (10, 120), (50, 3000)),
+    'B': ((50, 2000), (20, 300), (10, 150), (100, 8000)),
+    'I': ((10, 800), (10, 500), (5, 300), (10, 20000)),
+    'O': ((5, 500), (5, 500), (1, 200), (1, 5000))
+}
+
+# 吞吐量基準測試的寫入組合（名稱: 配置覆寫）；未安裝的選用套件會自動略過
+THROUGHPUT_VARIANTS = {
+    'openpyxl': {'write_only': True, 'streaming_input': True},
+    'xlsxwriter': {'writer': 'xlsxwriter', 'streaming_input': True}
+}
+
+
+def iter_applications(count: int, seed: int = 35) -> Iterator[Dict]:
+    """
+    逐筆產生合成的已核准申請資料
+    
+    涵蓋八大類（category_mapping），尺寸依類別取合理範圍，包裝欄位隨機組合
+    （含空白欄位）；相同 seed 產生相同資料，可重現基準測試結果。
+    """
+    rng = random.Random(seed)
+    categories = list(DIMENSION_RANGES)
+    base_date = datetime(2024, 1, 1)
+    
+    for idx in range(count):
+        category = categories[idx % len(categories)]
+        sub_category = f'{rng.randint(1, 12):02d}'
+        spec_category = rng.choice('ABCDE')
+        length, width, height, weight = DIMENSION_RANGES[category]
+        
+        packaging = {}
+        for key, (options, descriptions) in PACKAGING_CHOICES.items():
+            # 約兩成的包裝欄位未填寫
+            if rng.random() < 0.2:
+                continue
+            packaging[key] = {
+                'options': rng.sample(options, rng.randint(0, min(3, len(options)))),
+                'description': rng.choice(descriptions)
+            }
+        
+        app = {
+            'id': str(1700000000 + idx),
+            'submitDate': (base_date + timedelta(minutes=idx)).isoformat() + 'Z',
+            'status': 'APPROVED',
+            'itemCode': f'{category}{sub_category}.{spec_category}.{idx:05d}',
+            'mainCategory': category,
+            'subCategory': sub_category,
+            'specCategory': spec_category,
+            'itemNameCN': f'測試料件 {idx}',
+            'itemNameEN': f'Test Item {idx}',
+            'customerRef': f'CUST-{idx % 100:03d}',
+            'supplier': f'SUP{idx % 20:03d}',
+            'material': rng.choice(MATERIALS),
+            'surfaceFinish': rng.choice(SURFACE_FINISHES),
+            'dimensions': {
+                'length': rng.randint(*length),
+                'width': rng.randint(*width),
+                'height': rng.randint(*height),
+                'weight': round(rng.uniform(*weight), 1)
+            },
+            'moq': rng.choice([100, 200, 500, 1000, 5000]),
+            'unit': rng.choice(UNIT_OPTIONS),
+            'packaging': packaging
+        }
+        if category == 'H':
+            app['handleHoleDistance'] = rng.choice([64, 96, 128, 160, 192, 224, 256, 320])
+        elif category == 'S':
+            app['slideLoad'] = rng.choice(['25kg', '35kg', '45kg', '60kg'])
+            app['slideType'] = rng.choice(['Ball Bearing', 'Soft Close', 'Push Open'])
+            app['ballSize'] = rng.choice(['3mm', '4mm', '4.5mm'])
+        yield app
+
+
+def generate_applications(count: int, seed: int = 35) -> List[Dict]:
+    """產生合成的已核准申請資料"""
+    return list(iter_applications(count, seed))
+
+
+def write_applications_file(path: str, count: int, seed: int = 35) -> str:
+    """將合成申請資料逐筆寫成 JSON Lines 檔案（百萬筆時不需保留於記憶體）"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for app in iter_applications(count, seed):
+            f.write(json.dumps(app, ensure_ascii=False))
+            f.write('\n')
+    return path
+
+
+# 舊路徑（優化前的逐列資料映射）的凍結副本，作為擷取計畫的固定比較基準；
+# 處理器後續的優化（如包裝欄位快取）不會影響這裡的量測結果
+_LEGACY_PACKAGING_KEYS = ['個別產品包裝', '配件內容', '配件', '內盒', '外箱', '運輸與托盤要求', '裝櫃要求', 'Other']
+
+
+def _legacy_format_packaging_field(field_data: Any) -> str:
+    """舊路徑：格式化包裝欄位資料"""
+    if not field_data:
+        return ''
+    if isinstance(field_data, str):
+        return field_data
+    if isinstance(field_data, dict):
+        options = field_data.get('options', [])
+        description = field_data.get('description', '')
+        
+        result_parts = []
+        if options:
+            result_parts.append(f"[{', '.join(options)}]")
+        if description:
+            result_parts.append(description)
+        
+        return ' | '.join(result_parts) if result_parts else ''
+    if isinstance(field_data, list):
+        return ', '.join(str(item) for item in field_data)
+    return str(field_data)
+
+
+def _legacy_data_mapping(category_mapping: Dict[str, str], app: Dict) -> Dict[str, Any]:
+    """舊路徑：每列建立完整的資料映射字典"""
+    data_mapping = {
+        '料號': app.get('itemCode', ''),
+        '料件說明': app.get('itemNameCN', ''),
+        '客戶說明': app.get('itemNameEN', ''),
+        '產品大類': category_mapping.get(app.get('mainCategory', ''), ''),
+        '產品中類': app.get('subCategory', ''),
+        '產品小類': app.get('specCategory', ''),
+        '料件基本材質': app.get('material', ''),
+        '料件外型長': app.get('dimensions', {}).get('length', ''),
+        '料件外型寬': app.get('dimensions', {}).get('width', ''),
+        '料件外型高': app.get('dimensions', {}).get('height', ''),
+        '料件外型重量': app.get('dimensions', {}).get('weight', ''),
+        '料件表面處理': app.get('surfaceFinish', ''),
+        'MOQ': app.get('moq', ''),
+        '單位': app.get('unit', 'PCS'),
+        '客戶參考號': app.get('customerRef', ''),
+        '供應商編號': app.get('supplier', ''),
+        '建立日期': app.get('submitDate', ''),
+        '狀態': app.get('status', '')
+    }
+    
+    packaging = app.get('packaging', {})
+    for key in _LEGACY_PACKAGING_KEYS:
+        packaging_key = '其他說明' if key == 'Other' else key
+        field_data = packaging.get(packaging_key, packaging.get(key, {}))
+        data_mapping[key] = _legacy_format_packaging_field(field_data)
+    
+    main_category = app.get('mainCategory', '')
+    if main_category == 'H':
+        data_mapping['把手長度'] = app.get('dimensions', {}).get('length', '')
+        data_mapping['孔距'] = app.get('handleHoleDistance', '')
+    elif main_category == 'S':
+        data_mapping['滑軌長度'] = app.get('dimensions', {}).get('length', '')
+        data_mapping['滑軌載重'] = app.get('slideLoad', '')
+        data_mapping['滑軌類型'] = app.get('slideType', '')
+        data_mapping['鋼珠大小'] = app.get('ballSize', '')
+    
+    return data_mapping
+
+
+def _legacy_format_cell(column_name: str, value: Any, date_format: str) -> tuple:
+    """舊路徑：每格比對欄位名稱決定特殊格式"""
+    if '重量' in column_name or '長度' in column_name or '寬度' in column_name or '高度' in column_name:
+        try:
+            if value:
+                return float(value), '#,##0.00'
+        except:
+            pass
+    elif '日期' in column_name:
+        if value:
+            try:
+                date_obj = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                return date_obj.strftime(date_format), None
+            except:
+                pass
+    return value, None
+
+
+def _legacy_extract(processor: MaterialExcelProcessor, app: Dict, columns: List[str]) -> tuple:
+    """舊路徑：每列建立資料映射字典並逐欄比對欄位名稱"""
+    data_mapping = _legacy_data_mapping(processor.category_mapping, app)
+    date_format = processor.config['date_format']
+    formatted = [_legacy_format_cell(column_name, data_mapping.get(column_name, ''), date_format)
+                 for column_name in columns]
+    return [value for value, _ in formatted], [number_format for _, number_format in formatted]
+
+
+def bench_row_extraction(processor: MaterialExcelProcessor, applications: List[Dict]) -> Dict[str, float]:
+    """比較舊路徑與擷取計畫的列資料擷取速度（不含寫入儲存格）"""
+    grouped = {}
+    for app in applications:
+        sheet_name = processor.category_mapping.get(app['mainCategory'], 'Others')
+        grouped.setdefault(sheet_name, []).append(app)
+    
+    start = time.perf_counter()
+    legacy_rows = []
+    for sheet_name, apps in grouped.items():
+        columns = processor.category_columns[sheet_name]
+        for app in apps:
+            legacy_rows.append(_legacy_extract(processor, app, columns))
+    legacy_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    plan_rows = []
+    for sheet_name, apps in grouped.items():
+        plan = processor._get_column_plan(processor.category_columns[sheet_name])
+        for app in apps:
+            plan_rows.append(plan.extract(app))
+    plan_seconds = time.perf_counter() - start
+    
+    if legacy_rows != plan_rows:
+        raise AssertionError('擷取計畫結果與舊路徑不一致')
+    
+    return {
+        'rows': len(applications),
+        'legacy_seconds': legacy_seconds,
+        'plan_seconds': plan_seconds,
+        'speedup': legacy_seconds / plan_seconds if plan_seconds else float('inf')
+    }
+
+
+# ISO日期時間（擷取不含時區的當地時間部分）
+ISO_LOCAL_DATETIME_PATTERN = re.compile(
+    r'^(\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?)?)(?:Z|[+-]\d{2}:\d{2})?$'
+)
+
+
+def _columnar_extract(processor: MaterialExcelProcessor, columns: List[str],
+                      applications: Iterable[Dict]) -> Iterator[tuple]:
+    """
+    欄式擷取（實驗性）：逐欄取值後以pandas整欄轉換尺寸數值與ISO日期
+    
+    結果與處理器的 _extract_rows 相同。每秒筆數仍低於逐列擷取（取值與包裝
+    格式化仍是逐筆的Python呼叫，轉置回列資料另有成本），因此只保留於基準測試，
+    超過逐列擷取後再移入處理器並開放為轉換設定。
+    """
+    applications = applications if isinstance(applications, list) else list(applications)
+    count = len(applications)
+    if not count:
+        return iter(())
+    
+    plan = processor._get_column_plan(columns)
+    value_columns = []
+    format_columns = []
+    for getter, convert in zip(plan.getters, plan.converters):
+        # map 以C迴圈逐筆呼叫取值函式，不建立中間DataFrame
+        values = list(map(getter, applications))
+        number_formats = None
+        if convert == processor._convert_number:
+            values, number_formats = _columnar_numbers(processor, values)
+        elif convert == processor._convert_date:
+            values = _columnar_dates(processor, values)
+        value_columns.append(values)
+        format_columns.append(number_formats or repeat(None, count))
+    
+    return zip(map(list, zip(*value_columns)), map(list, zip(*format_columns)))
+
+
+def _columnar_numbers(processor: MaterialExcelProcessor, values: list) -> tuple:
+    """整欄轉換尺寸與重量數值（對應處理器的 _convert_number）"""
+    series = pd.Series(values, dtype=object)
+    numbers = pd.to_numeric(series, errors='coerce').astype('float64')
+    truthy = series.astype(bool)
+    converted = numbers.notna() & truthy
+    
+    values = series.where(~converted, numbers).tolist()
+    number_formats = np.where(converted, '#,##0.00', None).tolist()
+    
+    # to_numeric 無法解析但float()可能接受的值（如含底線的數字），逐筆處理
+    for idx in np.flatnonzero((numbers.isna() & truthy).to_numpy()):
+        values[idx], number_formats[idx] = processor._convert_number(values[idx])
+    return values, number_formats
+
+
+def _columnar_dates(processor: MaterialExcelProcessor, values: list) -> list:
+    """整欄轉換ISO日期（對應處理器的 _convert_date）"""
+    series = pd.Series(values, dtype=object)
+    values = list(values)
+    date_format = processor.config['date_format']
+    is_text = series.map(type) == str
+    if '%z' in date_format or '%Z' in date_format or not is_text.any():
+        # 需要時區資訊的格式逐筆處理
+        return [processor._convert_date(value)[0] for value in values]
+    
+    # 去除時區後綴取當地時間，與 fromisoformat 後 strftime 的結果相同
+    text = series[is_text]
+    local = text.str.extract(ISO_LOCAL_DATETIME_PATTERN, expand=False)
+    parsed = pd.to_datetime(local, format='ISO8601', errors='coerce')
+    formatted = parsed.dt.strftime(date_format)
+    
+    for idx, value in zip(np.flatnonzero(is_text.to_numpy()), formatted.tolist()):
+        if isinstance(value, str):
+            values[idx] = value
+        elif values[idx]:
+            # 非標準ISO寫法（如週日期），逐筆處理
+            values[idx] = processor._convert_date(values[idx])[0]
+    return values
+
+
+def bench_engines(applications: List[Dict], repeats: int = 3) -> Dict[str, float]:
+    """
+    比較逐列擷取（轉換使用的路徑）與實驗性欄式擷取的速度（不含寫入儲存格）
+    
+    欄式擷取（_columnar_extract）只存在於基準測試，每秒筆數超過逐列擷取前不移入處理器；
+    各取 repeats 次中的最短時間。
+    """
+    processor = MaterialExcelProcessor()
+    grouped = []
+    for sheet_name, columns in processor.category_columns.items():
+        code = next(code for code, name in processor.category_mapping.items() if name == sheet_name)
+        grouped.append((columns, [app for app in applications if app['mainCategory'] == code]))
+    
+    # 預熱：延遲載入的套件（如pandas）不計入擷取時間，並確認兩者結果一致
+    for columns, apps in grouped:
+        if list(processor._extract_rows(columns, apps)) != list(_columnar_extract(processor, columns, apps)):
+            raise AssertionError('欄式擷取結果與逐列擷取不一致')
+    
+    def best_seconds(extract) -> float:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for columns, apps in grouped:
+                for _ in extract(columns, apps):
+                    pass
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+    
+    cell_seconds = best_seconds(processor._extract_rows)
+    columnar_seconds = best_seconds(lambda columns, apps: _columnar_extract(processor, columns, apps))
+    return {
+        'rows': len(applications),
+        'cell_seconds': cell_seconds,
+        'columnar_seconds': columnar_seconds,
+        'speedup': cell_seconds / columnar_seconds if columnar_seconds else float('inf')
+    }
+
+
+def _legacy_write_row(ws, row_idx: int, extracted: tuple):
+    """舊路徑：每個儲存格以名稱指定具名樣式，再設定數字格式"""
+    values, number_formats = extracted
+    for col_idx, (value, number_format) in enumerate(zip(values, number_formats), 1):
+        cell = ws.cell(row=row_idx, column=col_idx, value=value)
+        cell.style = 'data'
+        if number_format:
+            cell.number_format = number_format
+
+
+def bench_cell_styles(applications: List[Dict]) -> Dict[str, float]:
+    """比較一般工作表逐格指定具名樣式與共用樣式快取的寫入成本（不含存檔）"""
+    processor = MaterialExcelProcessor()
+    columns = processor.category_columns['Handle']
+    apps = [app for app in applications if app['mainCategory'] == 'H']
+    rows = list(processor._extract_rows(columns, apps))
+    cells = len(rows) * len(columns)
+    
+    wb = processor._new_workbook()
+    ws = wb.create_sheet('Legacy')
+    start = time.perf_counter()
+    for row_idx, extracted in enumerate(rows, 2):
+        _legacy_write_row(ws, row_idx, extracted)
+    legacy_seconds = time.perf_counter() - start
+    
+    wb = processor._new_workbook()
+    ws = wb.create_sheet('Cached')
+    start = time.perf_counter()
+    styles = _CellStyles(ws)
+    for row_idx, extracted in enumerate(rows, 2):
+        processor._write_application_row(ws, row_idx, extracted, styles)
+    cached_seconds = time.perf_counter() - start
+    
+    return {
+        'cells': cells,
+        'legacy_per_100k': legacy_seconds / cells * 100000,
+        'cached_per_100k': cached_seconds / cells * 100000
+    }
+
+
+def bench_startup(runs: int = 5) -> Dict:
+    """以子程序量測模組匯入與 --help 的啟動時間（取中位數），並列出匯入時即載入的延遲套件"""
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    script = os.path.join(module_dir, 'excel_processor_v35_optimized.py')
+    
+    def median_seconds(args: List[str]) -> float:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + args, cwd=module_dir, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+    
+    probe = subprocess.run(
+        [sys.executable, '-c', 'import json, sys, excel_processor_v35_optimized; print(json.dumps(sorted(sys.modules)))'],
+        cwd=module_dir, check=True, capture_output=True, text=True
+    )
+    loaded = set(json.loads(probe.stdout.splitlines()[-1]))
+    
+    return {
+        'import_seconds': median_seconds(['-c', 'import excel_processor_v35_optimized']),
+        'help_seconds': median_seconds([script, '--help']),
+        'eager_modules': [name for name in LAZY_MODULES if name in loaded]
+    }
+
+
+def _run_throughput_case(action: str, config: Dict, input_paths: List[str], output_path: str) -> Dict:
+    """在獨立的子程序中執行單一動作，回傳耗時與該程序的尖峰記憶體"""
+    processor = MaterialExcelProcessor(config=config)
+    start = time.perf_counter()
+    if action == 'convert':
+        result_path = processor.process_json_to_excel(input_paths[0], output_path)
+    elif action == 'validate':
+        result_path = input_paths[0]
+        results = processor.validate_excel_format(input_paths[0], check_content=True)
+        if not results['valid']:
+            raise AssertionError(f"驗證失敗: {results['errors'][:5]}")
+    else:
+        result_path = processor.merge_excel_files(input_paths, output_path)
+    seconds = time.perf_counter() - start
+    
+    return {
+        'seconds': seconds,
+        'peak_memory_mb': _peak_memory_mb(),
+        'output_bytes': os.path.getsize(result_path) if os.path.isfile(result_path) else None
+    }
+
+
+def _measure(action: str, config: Dict, input_paths: List[str], output_path: str) -> Dict:
+    """以 spawn 啟動全新子程序量測，尖峰記憶體不受先前的測試影響"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_run_throughput_case, action, config, input_paths, output_path).result()
+
+
+def bench_throughput(sizes: List[int], variants: List[str], work_dir: str) -> List[Dict[str, Any]]:
+    """
+    量測各資料量下轉換（各寫入組合）、驗證與合併的吞吐量與尖峰記憶體
+    
+    輸入為 JSON Lines 檔案；驗證與合併使用 openpyxl 組合（未執行時取第一個組合）的轉換結果，
+    合併為同一檔案合併兩次（處理筆數為資料量的兩倍）。
+    """
+    available = {
+        'openpyxl': True,
+        'xlsxwriter': xlsxwriter.available
+    }
+    results = []
+    
+    def record(benchmark, variant, rows, measured):
+        results.append(dict(
+            measured,
+            benchmark=benchmark,
+            variant=variant,
+            rows=rows,
+            rows_per_second=rows / measured['seconds'] if measured['seconds'] else None
+        ))
+        print(f"{benchmark:<8} {variant:<10} {rows:>9,} 筆  {measured['seconds']:8.2f} 秒  "
+              f"{results[-1]['rows_per_second']:>10,.0f} 筆/秒  尖峰 {measured['peak_memory_mb']} MB")
+    
+    for size in sizes:
+        input_path = write_applications_file(os.path.join(work_dir, f'apps_{size}.jsonl'), size)
+        
+        converted = {}
+        for variant in variants:
+            if not available[variant]:
+                print(f"略過 {variant}：未安裝所需套件")
+                continue
+            output_path = os.path.join(work_dir, f'convert_{variant}_{size}.xlsx')
+            record('convert', variant, size,
+                   _measure('convert', THROUGHPUT_VARIANTS[variant], [input_path], output_path))
+            converted[variant] = output_path
+        
+        if not converted:
+            continue
+        reference_variant = 'openpyxl' if 'openpyxl' in converted else next(iter(converted))
+        reference = converted[reference_variant]
+        record('validate', reference_variant, size, _measure('validate', {}, [reference], ''))
+        record('merge', reference_variant, size * 2,
+               _measure('merge', {}, [reference, reference],
+                        os.path.join(work_dir, f'merge_{size}.xlsx')))
+        
+        # 大量資料的中間檔案用畢即刪除，避免暫存空間不足
+        for path in [input_path] + list(converted.values()):
+            os.remove(path)
+    
+    return results
+
+
+def compare_with_baseline(results: List[Dict], baseline_path: str, max_regression: float) -> List[str]:
+    """與前一版的JSON結果比較，列出每秒筆數下降超過上限的項目"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    
+    previous = {
+        (item['benchmark'], item['variant'], item['rows']): item
+        for item in baseline.get('throughput', [])
+    }
+    regressions = []
+    for item in results:
+        old = previous.get((item['benchmark'], item['variant'], item['rows']))
+        if not old or not old.get('rows_per_second') or not item['rows_per_second']:
+            continue
+        change = item['rows_per_second'] / old['rows_per_second'] - 1
+        if change < -max_regression:
+            regressions.append(
+                f"{item['benchmark']}/{item['variant']} {item['rows']:,} 筆: "
+                f"{old['rows_per_second']:,.0f} → {item['rows_per_second']:,.0f} 筆/秒 ({change:+.0%})"
+            )
+    return regressions
+
+
+def _environment() -> Dict[str, Any]:
+    """記錄執行環境，供跨版本比較結果時參考"""
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(
+        description='物料編碼申請管理系統 V3.5 Excel處理器效能基準測試'
+    )
+    parser.add_argument(
+        '--rows',
+        type=int,
+        default=100000,
+        help='合成申請資料筆數'
+    )
+    parser.add_argument(
+        '--benchmarks',
+        nargs='+',
+        choices=['extraction', 'engines', 'startup', 'styles', 'throughput'],
+        default=['extraction', 'engines', 'startup', 'styles'],
+        help='要執行的基準測試'
+    )
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        type=int,
+        default=[1000, 10000, 100000],
+        help='吞吐量基準測試的資料筆數（可加入 1000000）'
+    )
+    parser.add_argument(
+        '--variants',
+        nargs='+',
+        choices=list(THROUGHPUT_VARIANTS),
+        default=list(THROUGHPUT_VARIANTS),
+        help='吞吐量基準測試的寫入組合'
+    )
+    parser.add_argument(
+        '--work-dir',
+        help='吞吐量基準測試的暫存資料夾（預設為系統暫存資料夾）'
+    )
+    parser.add_argument(
+        '--json',
+        help='將結果寫入JSON檔'
+    )
+    parser.add_argument(
+        '--baseline',
+        help='前一版的JSON結果，用於偵測吞吐量退化'
+    )
+    parser.add_argument(
+        '--max-regression',
+        type=float,
+        default=0.2,
+        help='每秒筆數允許的最大下降比例，超過時以非零狀態結束（預設0.2）'
+    )
+    parser.add_argument(
+        '--max-startup-ms',
+        type=float,
+        default=250,
+        help='--help 啟動時間上限（毫秒），超過時以非零狀態結束（預設250；匯入時載入openpyxl即會超過）'
+    )
+    args = parser.parse_args()
+    
+    needs_applications = {'extraction', 'engines', 'styles'} & set(args.benchmarks)
+    applications = generate_applications(args.rows) if needs_applications else []
+    report = {'environment': _environment(), 'rows': args.rows}
+    failed = False
+    
+    if 'extraction' in args.benchmarks:
+        result = bench_row_extraction(MaterialExcelProcessor(), applications)
+        report['extraction'] = result
+        print("="*60)
+        print("列資料擷取（資料映射 vs 擷取計畫）")
+        print("="*60)
+        print(f"筆數: {result['rows']}")
+        print(f"舊路徑: {result['legacy_seconds']:.3f} 秒 ({result['rows'] / result['legacy_seconds']:,.0f} 筆/秒)")
+        print(f"擷取計畫: {result['plan_seconds']:.3f} 秒 ({result['rows'] / result['plan_seconds']:,.0f} 筆/秒)")
+        print(f"加速倍數: {result['speedup']:.1f}x")
+    
+    if 'engines' in args.benchmarks and not pd.available:
+        print("未安裝pandas，略過欄式擷取比較")
+    elif 'engines' in args.benchmarks:
+        print("="*60)
+        print("列資料擷取（逐列 vs 實驗性欄式）")
+        print("="*60)
+        result = bench_engines(applications)
+        report['engines'] = result
+        print(f"逐列: {result['rows'] / result['cell_seconds']:,.0f} 筆/秒")
+        print(f"欄式: {result['rows'] / result['columnar_seconds']:,.0f} 筆/秒")
+        print(f"欄式 / 逐列: {result['speedup']:.2f}x"
+              + ("" if result['speedup'] > 1 else "（尚未超過逐列擷取，不開放為轉換設定）"))
+    
+    if 'styles' in args.benchmarks:
+        result = bench_cell_styles(applications)
+        report['styles'] = result
+        print("="*60)
+        print("儲存格樣式（逐格具名樣式 vs 樣式快取）")
+        print("="*60)
+        print(f"儲存格數: {result['cells']:,}")
+        print(f"逐格具名樣式: 每10萬格 {result['legacy_per_100k']:.3f} 秒")
+        print(f"樣式快取: 每10萬格 {result['cached_per_100k']:.3f} 秒")
+        print(f"加速倍數: {result['legacy_per_100k'] / result['cached_per_100k']:.1f}x")
+    
+    if 'startup' in args.benchmarks:
+        result = bench_startup()
+        report['startup'] = result
+        print("="*60)
+        print("命令列啟動時間")
+        print("="*60)
+        print(f"匯入模組: {result['import_seconds'] * 1000:.0f} 毫秒")
+        print(f"--help: {result['help_seconds'] * 1000:.0f} 毫秒")
+        
+        if result['eager_modules']:
+            print(f"❌ 匯入時即載入延遲套件: {result['eager_modules']}")
+            failed = True
+        if args.max_startup_ms and result['help_seconds'] * 1000 > args.max_startup_ms:
+            print(f"❌ 啟動時間超過上限 {args.max_startup_ms:.0f} 毫秒")
+            failed = True
+    
+    if 'throughput' in args.benchmarks:
+        print("="*60)
+        print("轉換 / 驗證 / 合併吞吐量與尖峰記憶體")
+        print("="*60)
+        with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+            report['throughput'] = bench_throughput(args.sizes, args.variants, work_dir)
+        
+        if args.baseline:
+            regressions = compare_with_baseline(report['throughput'], args.baseline, args.max_regression)
+            report['regressions'] = regressions
+            for regression in regressions:
+                print(f"❌ 吞吐量退化: {regression}")
+            failed = failed or bool(regressions)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📄 結果已寫入: {args.json}")
+    
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
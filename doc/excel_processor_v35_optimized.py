@@ -9,24 +9,130 @@ Excel處理器 - 增強版
 3. 包裝說明欄位的完整處理
 4. 資料驗證和錯誤處理
 5. 批量處理支援
+6. 串流寫入模式（write-only），大量資料匯出時記憶體維持平穩
+7. 串流讀取JSON陣列與JSON Lines（NDJSON）輸入
+8. 依每張工作表最大筆數自動分片（Handle_001、Handle_002 ...）
+9. 多程序平行產生各類別工作表（多檔案組合輸出）
+10. 可切換的Excel寫入引擎（openpyxl / xlsxwriter constant_memory）
+11. CSV / TSV / Parquet 輸出（各類別獨立檔案，供SAP大量匯入）
+12. 快速驗證（單次走訪、內容檢查、抽樣與錯誤上限）
+13. 多檔案平行合併與驗證（支援萬用字元）
+14. 增量匯出（SQLite清單記錄已匯出申請，只輸出新增或變更的資料）
+15. 輸出快取（內容雜湊為鍵，容量上限與LRU淘汰）
+16. 常駐匯出服務（asyncio工作佇列、程序池、狀態查詢與下載端點）
+17. 延遲載入openpyxl、pyarrow等重量級套件，命令列與匯出服務快速啟動
+18. 匯出指標（各階段耗時、每秒筆數、儲存格數、尖峰記憶體）與 --profile 效能剖析
+19. 分塊匯出（每N筆一個檔案、分塊清單與檢查點，中斷後可續傳）
+20. 匯入SAP工作表為申請資料（JSON Lines，逐列串流）
+21. 包裝欄位格式化快取（相同包裝範本只格式化一次，LRU淘汰與命中統計）
+22. 直接讀取資料庫（PostgreSQL伺服器端游標 / SQLite，逐批讀取已核准申請）
+23. 直接讀取 .gz / .bz2 / .zst 壓縮輸入檔，未壓縮檔以記憶體對映讀取
+24. 摘要統計單次走訪累加（中類 / 小類、供應商、單位、尺寸與重量）
+25. 匯出檔差異比對（料號雜湊索引，列出新增、刪除與變更欄位）
 
 作者: System Development Team
 版本: V3.5 Optimized
 日期: 2024-11-21
 """
 
-import pandas as pd
+import importlib
+import importlib.util
 import json
 import os
 import sys
+from copy import copy
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-import openpyxl
-from openpyxl.styles import PatternFill, Alignment, Font, Border, Side, NamedStyle
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.datavalidation import DataValidation
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional
 import logging
 import argparse
+import re
+import secrets
+import codecs
+import csv
+import glob
+import hashlib
+import hmac
+import io
+import mmap
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from operator import methodcaller
+from urllib.parse import urlsplit
+
+
+try:
+    import resource
+except ImportError:  # Windows沒有resource模組，不記錄尖峰記憶體
+    resource = None
+
+
+class _LazyModule:
+    """
+    延遲載入的模組：第一次存取屬性時才匯入
+    
+    openpyxl / pyarrow 等套件匯入成本高，只在實際用到的動作中載入，
+    讓 --help 與匯出服務主程序維持快速啟動。
+    """
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    @property
+    def available(self) -> bool:
+        """套件是否已安裝（不會實際匯入）"""
+        if self._module is not None or self._name in sys.modules:
+            return True
+        try:
+            return importlib.util.find_spec(self._name) is not None
+        except ImportError:
+            return False
+    
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        value = getattr(self._module, attr)
+        # 存為實例屬性，之後的存取（如逐格建立儲存格）不再經過 __getattr__
+        setattr(self, attr, value)
+        return value
+
+
+# openpyxl 匯入約需0.25秒（並會載入numpy），只在實際讀寫工作簿時載入
+openpyxl = _LazyModule('openpyxl')
+openpyxl_cell = _LazyModule('openpyxl.cell')
+openpyxl_styles = _LazyModule('openpyxl.styles')
+openpyxl_utils = _LazyModule('openpyxl.utils')
+openpyxl_datavalidation = _LazyModule('openpyxl.worksheet.datavalidation')
+
+# 僅匯出服務需要
+asyncio = _LazyModule('asyncio')
+
+# 僅 --profile 需要
+cProfile = _LazyModule('cProfile')
+pstats = _LazyModule('pstats')
+tracemalloc = _LazyModule('tracemalloc')
+
+# 選用套件：ijson（未安裝時使用內建增量解析器）、xlsxwriter寫入引擎、Parquet輸出
+ijson = _LazyModule('ijson')
+xlsxwriter = _LazyModule('xlsxwriter')
+pa = _LazyModule('pyarrow')
+pq = _LazyModule('pyarrow.parquet')
+
+# 選用套件：直接讀取PostgreSQL（Supabase）資料庫
+psycopg2 = _LazyModule('psycopg2')
+
+# 壓縮輸入檔（.zst 需安裝zstandard）
+gzip = _LazyModule('gzip')
+bz2 = _LazyModule('bz2')
+zstandard = _LazyModule('zstandard')
 
 # 設定日誌
 logging.basicConfig(
@@ -36,16 +142,660 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 可直接讀取的壓縮輸入檔副檔名
+INPUT_COMPRESSIONS = ('.gz', '.bz2', '.zst')
+
+# 輸出格式對應的副檔名
+OUTPUT_EXTENSIONS = {'xlsx': '.xlsx', 'csv': '.csv', 'tsv': '.tsv', 'parquet': '.parquet'}
+
+# 單位下拉選單選項
+UNIT_OPTIONS = ['PCS', 'SET', 'PAIR', 'KG', 'M', 'BOX']
+
+# 驗證時必須存在且不可為空的欄位
+REQUIRED_COLUMNS = ['料號', '料件說明', '料件基本材質']
+
+# 料件外型尺寸欄位：匯出時保留原值（不轉為數值格式），驗證內容時仍須為數值
+DIMENSION_COLUMNS = ['料件外型長', '料件外型寬', '料件外型高']
+
+# 匯出內容使用的申請欄位（與 _init_column_getters 對應），用於增量匯出的內容雜湊
+EXPORT_FIELDS = [
+    'itemCode', 'itemNameCN', 'itemNameEN', 'mainCategory', 'subCategory', 'specCategory',
+    'material', 'dimensions', 'surfaceFinish', 'moq', 'unit', 'customerRef', 'supplier',
+    'submitDate', 'status', 'packaging', 'handleHoleDistance', 'slideLoad', 'slideType', 'ballSize'
+]
+
+# 匯入時欄位對應的申請資料路徑（_init_column_getters 的反向對應，不含產品大類與包裝欄位）
+# 同一路徑出現在多個欄位時（如 料件外型長 / 把手長度）以第一個有值的欄位為準
+IMPORT_FIELDS = {
+    '料號': ('itemCode',),
+    '料件說明': ('itemNameCN',),
+    '客戶說明': ('itemNameEN',),
+    '產品中類': ('subCategory',),
+    '產品小類': ('specCategory',),
+    '料件基本材質': ('material',),
+    '料件外型長': ('dimensions', 'length'),
+    '料件外型寬': ('dimensions', 'width'),
+    '料件外型高': ('dimensions', 'height'),
+    '料件外型重量': ('dimensions', 'weight'),
+    '料件表面處理': ('surfaceFinish',),
+    'MOQ': ('moq',),
+    '單位': ('unit',),
+    '客戶參考號': ('customerRef',),
+    '供應商編號': ('supplier',),
+    '建立日期': ('submitDate',),
+    '狀態': ('status',),
+    '把手長度': ('dimensions', 'length'),
+    '孔距': ('handleHoleDistance',),
+    '滑軌長度': ('dimensions', 'length'),
+    '滑軌載重': ('slideLoad',),
+    '滑軌類型': ('slideType',),
+    '鋼珠大小': ('ballSize',)
+}
+
+# 包裝欄位格式化結果：[選項1, 選項2] | 說明（兩部分皆可省略）
+PACKAGING_FIELD_PATTERN = re.compile(r'^\[(.*?)\](?: \| (.*))?$', re.DOTALL)
+
+# 分片工作表名稱，如 Handle_001
+SHARD_SHEET_PATTERN = re.compile(r'^(.+)_(\d{3,})$')
+
+
+# 共用的空字典預設值（唯讀，避免每次取值都建立新字典）
+_EMPTY_DICT = {}
+
+
+def _diff_value(value: Any) -> Optional[str]:
+    """比對用的儲存格值：空白視為無值，整數值的浮點數與整數視為相同"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return str(value)
+
+
+def _is_number_text(value: Any) -> bool:
+    """文字內容是否為數值（如JSON中以字串傳入的尺寸 "12.5"）"""
+    if not isinstance(value, str):
+        return False
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _empty_value(app: Dict) -> str:
+    """無對應資料的欄位一律為空字串"""
+    return ''
+
+
+def _packaging_key(field_data: Any) -> tuple:
+    """
+    包裝欄位的可雜湊鍵值，鍵值相同者格式化結果必定相同
+    
+    1、1.0、True 彼此相等且雜湊值相同，但 str() 結果不同，因此列表元素與
+    其他非字串值以 str() 後的文字為鍵（格式化結果本來就只取決於該文字）。
+    字典的選項以 join 組合，只接受字串，維持原值即可。
+    """
+    if isinstance(field_data, dict):
+        options = field_data.get('options', [])
+        if isinstance(options, list):
+            options = tuple(options)
+        return (dict, options, field_data.get('description', ''))
+    if isinstance(field_data, list):
+        return (list, tuple(map(str, field_data)))
+    return (str, str(field_data) if field_data else '')
+
+
+class _PackagingFormatCache:
+    """
+    包裝欄位格式化結果的快取（以 _packaging_key 為鍵，LRU淘汰）
+    
+    申請多由少數包裝範本建立，相同內容的包裝欄位只格式化一次，
+    之後只需一次雜湊查詢。hits / misses 記錄快取命中率。
+    """
+    
+    def __init__(self, format_field: Callable[[Any], str], max_entries: int):
+        self._format_field = format_field
+        self.max_entries = max_entries
+        self.uncacheable = 0
+        self.format_key = lru_cache(maxsize=max_entries)(self._format_key)
+    
+    def format(self, field_data: Any) -> str:
+        """格式化包裝欄位，結果與 _format_packaging_field 相同"""
+        if not field_data:
+            return ''
+        if isinstance(field_data, str):
+            return field_data
+        try:
+            if type(field_data) is dict:
+                # 最常見的 {options, description} 直接組鍵值（與 _packaging_key 相同），省去一層呼叫
+                options = field_data.get('options', [])
+                return self.format_key((dict, tuple(options) if type(options) is list else options,
+                                        field_data.get('description', '')))
+            return self.format_key(_packaging_key(field_data))
+        except TypeError:
+            # 選項含不可雜湊的內容時不快取
+            self.uncacheable += 1
+            return self._format_field(field_data)
+    
+    def _format_key(self, key: tuple) -> str:
+        """由鍵值還原包裝欄位內容後格式化"""
+        kind = key[0]
+        if kind is dict:
+            return self._format_field({'options': key[1], 'description': key[2]})
+        if kind is list:
+            return self._format_field(list(key[1]))
+        return self._format_field(key[1])
+    
+    def stats(self) -> Dict[str, int]:
+        info = self.format_key.cache_info()
+        return {
+            'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+            'max_entries': self.max_entries, 'uncacheable': self.uncacheable
+        }
+
+
+class _ColumnPlan:
+    """
+    預先編譯的欄位擷取計畫
+    
+    getters 為各欄位的取值函式；converters 為各欄位的格式轉換函式
+    （無需轉換時為None），只保留需轉換的欄位索引以減少每列的判斷。
+    """
+    
+    __slots__ = ('getters', 'converters', '_conversions', '_width')
+    
+    def __init__(self, getters: List[Callable[[Dict], Any]], converters: List[Optional[Callable]]):
+        self.getters = getters
+        self.converters = converters
+        self._conversions = [(idx, convert) for idx, convert in enumerate(converters) if convert is not None]
+        self._width = len(getters)
+    
+    def extract(self, app: Dict) -> tuple:
+        """
+        擷取單筆申請的欄位值
+        
+        Returns:
+            (值列表, 數字格式列表)，數字格式無則為None
+        """
+        values = [getter(app) for getter in self.getters]
+        number_formats = [None] * self._width
+        for idx, convert in self._conversions:
+            values[idx], number_formats[idx] = convert(values[idx])
+        return values, number_formats
+
+
+def _content_hash(app: Dict) -> str:
+    """計算申請匯出欄位的內容雜湊"""
+    payload = json.dumps(
+        [app.get(key) for key in EXPORT_FIELDS],
+        ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _ExportManifest:
+    """
+    增量匯出清單（SQLite），記錄已匯出申請的 id 與內容雜湊
+    
+    本次新增或變更的申請先記在暫存表，輸出成功後才以 commit 寫入清單，
+    輸出失敗時下次執行仍會重新匯出。
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS exported ('
+            'id TEXT PRIMARY KEY, content_hash TEXT NOT NULL, exported_at TEXT NOT NULL)'
+        )
+        self.conn.execute('CREATE TEMP TABLE pending (id TEXT PRIMARY KEY, content_hash TEXT NOT NULL)')
+        self.changed = 0
+        self.skipped = 0
+    
+    def is_changed(self, app: Dict) -> bool:
+        """申請為新增或內容已變更時回傳True並記入暫存表"""
+        app_id = app.get('id')
+        if app_id is None or app_id == '':
+            # 無 id 的申請無法追蹤，一律匯出
+            self.changed += 1
+            return True
+        
+        app_id = str(app_id)
+        content_hash = _content_hash(app)
+        row = self.conn.execute('SELECT content_hash FROM exported WHERE id = ?', (app_id,)).fetchone()
+        if row is not None and row[0] == content_hash:
+            self.skipped += 1
+            return False
+        
+        self.conn.execute('INSERT OR REPLACE INTO pending VALUES (?, ?)', (app_id, content_hash))
+        self.changed += 1
+        return True
+    
+    def commit(self):
+        """將本次匯出的申請寫入清單"""
+        exported_at = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO exported SELECT id, content_hash, ? FROM pending', (exported_at,)
+            )
+            self.conn.execute('DELETE FROM pending')
+    
+    def close(self):
+        self.conn.close()
+
+
+class _ChunkCheckpoint:
+    """
+    分塊匯出的檢查點與分塊清單（JSON）
+    
+    每完成一個分塊檔案即以暫存檔加 os.replace 原子更新，中斷後重新執行時
+    從最後一個完成的分塊之後繼續。fingerprint 記錄輸入來源與設定，
+    不一致時拒絕續傳，避免混合不同資料的分塊。
+    """
+    
+    def __init__(self, path: str, fingerprint: Dict[str, Any]):
+        self.path = path
+        self.state = {'fingerprint': fingerprint, 'complete': False, 'rows': 0, 'chunks': []}
+        
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('fingerprint') != fingerprint:
+                raise ValueError(f"檢查點與目前的輸入或設定不符，請改用其他輸出路徑或刪除 {path}")
+            for chunk in state['chunks']:
+                if not os.path.exists(os.path.join(os.path.dirname(path), chunk['file'])):
+                    raise ValueError(f"檢查點記錄的分塊檔案不存在: {chunk['file']}")
+            self.state = state
+    
+    @property
+    def complete(self) -> bool:
+        return self.state['complete']
+    
+    @property
+    def rows(self) -> int:
+        """已完成分塊的累計筆數（續傳時略過的已核准申請數）"""
+        return self.state['rows']
+    
+    @property
+    def chunks(self) -> List[Dict]:
+        return self.state['chunks']
+    
+    def add(self, file_name: str, rows: int, first_id: Any, last_id: Any):
+        """記錄完成的分塊"""
+        self.state['chunks'].append({
+            'file': file_name, 'rows': rows, 'first_id': first_id, 'last_id': last_id,
+            'completed_at': datetime.now().isoformat(timespec='seconds')
+        })
+        self.state['rows'] += rows
+        self.save()
+    
+    def finish(self):
+        self.state['complete'] = True
+        self.save()
+    
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(temp_path, self.path)
+
+
+class _DatabaseSource:
+    """
+    直接從資料庫讀取申請資料（Supabase schema，src/database/supabase）
+    
+    狀態篩選在查詢中完成；PostgreSQL 使用具名（伺服器端）游標，每次只取回
+    batch_size 筆，SQLite 以相同查詢逐批讀取，可作為本機測試替身。
+    申請與包裝資料以兩個依申請 id 排序的游標合併，記憶體只保留一批資料。
+    可重複迭代（每次迭代重新查詢），輸出快取計算快取鍵後仍可再讀取。
+    """
+    
+    APPLICATION_QUERY = (
+        'SELECT a.id, a.item_code, mc.code, sc.code, pc.code, a.item_name_cn, a.item_name_en, '
+        'a.material, a.surface_finish, a.dimensions, a.moq, a.unit, a.customer_ref, s.code, '
+        'a.submit_date, a.status '
+        'FROM applications a '
+        'LEFT JOIN product_categories mc ON mc.id = a.main_category_id '
+        'LEFT JOIN product_categories sc ON sc.id = a.sub_category_id '
+        'LEFT JOIN product_categories pc ON pc.id = a.spec_category_id '
+        'LEFT JOIN suppliers s ON s.id = a.supplier_id '
+        'WHERE a.status = {param} ORDER BY a.id'
+    )
+    
+    PACKAGING_QUERY = (
+        'SELECT ap.application_id, COALESCE(c.name_cn, c.code), o.code, ap.description '
+        'FROM application_packaging ap '
+        'JOIN applications a ON a.id = ap.application_id '
+        'JOIN packaging_categories c ON c.id = ap.packaging_category_id '
+        'JOIN packaging_options o ON o.id = ap.packaging_option_id '
+        'WHERE a.status = {param} '
+        'ORDER BY ap.application_id, c.display_order, ap.display_order, ap.id'
+    )
+    
+    APPLICATION_FIELDS = [
+        'id', 'itemCode', 'mainCategory', 'subCategory', 'specCategory', 'itemNameCN', 'itemNameEN',
+        'material', 'surfaceFinish', 'dimensions', 'moq', 'unit', 'customerRef', 'supplier',
+        'submitDate', 'status'
+    ]
+    
+    def __init__(self, dsn: str, batch_size: int = 5000, status: str = 'APPROVED'):
+        self.dsn = dsn
+        self.batch_size = batch_size
+        self.status = status
+        self.is_postgres = dsn.startswith(('postgres://', 'postgresql://'))
+        if self.is_postgres and not psycopg2.available:
+            raise ImportError('讀取PostgreSQL資料庫需安裝psycopg2套件')
+    
+    def _connect(self):
+        if self.is_postgres:
+            return psycopg2.connect(self.dsn)
+        path = self.dsn[len('sqlite:///'):] if self.dsn.startswith('sqlite:///') else self.dsn
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"找不到資料庫檔案: {path}")
+        return sqlite3.connect(path)
+    
+    def _cursor(self, conn, name: str, query: str):
+        """開啟查詢游標（PostgreSQL 為伺服器端游標）"""
+        if self.is_postgres:
+            cursor = conn.cursor(name=name)
+            cursor.itersize = self.batch_size
+            cursor.execute(query.format(param='%s'), (self.status,))
+        else:
+            cursor = conn.cursor()
+            cursor.execute(query.format(param='?'), (self.status,))
+        return cursor
+    
+    def _iter_rows(self, cursor) -> Iterator[tuple]:
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                return
+            yield from rows
+    
+    def __iter__(self) -> Iterator[Dict]:
+        conn = self._connect()
+        try:
+            applications = self._iter_rows(self._cursor(conn, 'material_export_applications', self.APPLICATION_QUERY))
+            packaging_rows = self._iter_rows(self._cursor(conn, 'material_export_packaging', self.PACKAGING_QUERY))
+            pending = next(packaging_rows, None)
+            
+            for row in applications:
+                app = {
+                    field: value for field, value in zip(self.APPLICATION_FIELDS, row)
+                    if value is not None
+                }
+                if isinstance(app.get('dimensions'), str):
+                    # SQLite 以文字儲存 JSONB 欄位
+                    app['dimensions'] = json.loads(app['dimensions'])
+                if isinstance(app.get('submitDate'), datetime):
+                    app['submitDate'] = app['submitDate'].isoformat()
+                
+                # 合併此申請的包裝選項（兩個游標皆依申請 id 排序）
+                packaging = {}
+                while pending is not None and pending[0] <= row[0]:
+                    if pending[0] == row[0]:
+                        _, category, option, description = pending
+                        section = packaging.setdefault(category, {'options': [], 'description': ''})
+                        section['options'].append(option)
+                        if description and not section['description']:
+                            section['description'] = description
+                    pending = next(packaging_rows, None)
+                app['packaging'] = packaging
+                yield app
+        finally:
+            conn.close()
+
+
+class _OutputCache:
+    """
+    以內容雜湊為鍵的輸出快取（磁碟），超過容量上限時依最近使用時間淘汰
+    
+    單一檔案輸出存為 <鍵>.xlsx，檔案組合輸出存為 <鍵>/ 資料夾；
+    命中時更新修改時間作為最近使用時間。
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def entry_path(self, key: str, is_bundle: bool) -> str:
+        return os.path.join(self.cache_dir, key if is_bundle else f"{key}.xlsx")
+    
+    def get(self, entry_path: str, output_path: str) -> bool:
+        """快取命中時複製到輸出路徑並回傳True"""
+        if not os.path.exists(entry_path):
+            return False
+        
+        os.utime(entry_path)
+        if os.path.isdir(entry_path):
+            shutil.copytree(entry_path, output_path, dirs_exist_ok=True)
+        else:
+            shutil.copyfile(entry_path, output_path)
+        return True
+    
+    def put(self, entry_path: str, output_path: str):
+        """將輸出存入快取（先寫入暫存名稱再更名，避免讀到寫一半的檔案）"""
+        tmp_path = os.path.join(self.cache_dir, f".tmp_{os.getpid()}_{os.path.basename(entry_path)}")
+        if os.path.isdir(output_path):
+            shutil.copytree(output_path, tmp_path)
+        else:
+            shutil.copyfile(output_path, tmp_path)
+        
+        try:
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            # 其他程序已存入相同內容的資料夾
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict()
+    
+    def evict(self):
+        """超過容量上限時，從最久未使用的項目開始刪除"""
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.cache_dir):
+            if name.startswith('.tmp_'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            size = self._size(path)
+            entries.append((os.path.getmtime(path), size, path))
+            total_size += size
+        
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+            total_size -= size
+            logger.info(f"快取淘汰: {os.path.basename(path)}")
+    
+    def _size(self, path: str) -> int:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path) for name in names
+        )
+
+
+class _ExportMetrics:
+    """
+    匯出各階段的耗時、筆數、儲存格數與尖峰記憶體
+    
+    同名階段多次執行時累加（如每張工作表的 write_rows）；階段可巢狀，
+    例如 write_rows 包含該工作表的 data_validation。
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.sheets = []
+    
+    @contextmanager
+    def stage(self, name: str):
+        """記錄一個階段的耗時；呼叫端可在 record 中填入 rows / cells"""
+        record = {'rows': 0, 'cells': 0}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            totals = self.stages.setdefault(name, {'seconds': 0.0, 'rows': 0, 'cells': 0, 'calls': 0})
+            totals['seconds'] += seconds
+            totals['rows'] += record['rows']
+            totals['cells'] += record['cells']
+            totals['calls'] += 1
+            if 'sheet' in record:
+                self.sheets.append({
+                    'sheet': record['sheet'], 'rows': record['rows'],
+                    'cells': record['cells'], 'seconds': round(seconds, 6)
+                })
+    
+    def report(self, input_rows: int) -> Dict[str, Any]:
+        """彙整為可輸出為JSON的指標"""
+        total_seconds = time.perf_counter() - self.started
+        stages = {}
+        for name, totals in self.stages.items():
+            stages[name] = dict(totals, seconds=round(totals['seconds'], 6))
+            if totals['rows'] and totals['seconds']:
+                stages[name]['rows_per_second'] = round(totals['rows'] / totals['seconds'], 1)
+        
+        return {
+            'total_seconds': round(total_seconds, 6),
+            'input_rows': input_rows,
+            'rows_per_second': round(input_rows / total_seconds, 1) if total_seconds else None,
+            'cells_written': self.stages.get('write_rows', {}).get('cells', 0),
+            'peak_memory_mb': _peak_memory_mb(),
+            'stages': stages,
+            'sheets': self.sheets
+        }
+
+
+def _peak_memory_mb() -> Optional[float]:
+    """目前程序的尖峰常駐記憶體（MB），不含工作程序"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以位元組為單位，Linux 以KB為單位
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class _SummaryAggregator:
+    """
+    摘要工作表的單次走訪統計
+    
+    在分組時隨資料流累加大類 / 中類 / 小類、供應商與單位的筆數，以及尺寸與
+    重量的最小值、最大值與平均值；摘要工作表直接由累加結果產生，不需再次
+    走訪或保留申請資料。
+    """
+    
+    # (尺寸鍵值, 摘要顯示名稱)
+    DIMENSIONS = [('length', '長度'), ('width', '寬度'), ('height', '高度'), ('weight', '重量')]
+    
+    def __init__(self):
+        self.categories = {}
+        self.suppliers = {}
+        self.units = {}
+        # 尺寸鍵值: [筆數, 總和, 最小值, 最大值]
+        self.dimensions = {key: [0, 0.0, None, None] for key, _ in self.DIMENSIONS}
+    
+    def add(self, app: Dict, category: str):
+        key = (category, app.get('subCategory', ''), app.get('specCategory', ''))
+        self.categories[key] = self.categories.get(key, 0) + 1
+        supplier = app.get('supplier', '')
+        self.suppliers[supplier] = self.suppliers.get(supplier, 0) + 1
+        # 與匯出的單位欄位相同，未填時為 PCS
+        unit = app.get('unit', 'PCS')
+        self.units[unit] = self.units.get(unit, 0) + 1
+        
+        dimensions = app.get('dimensions')
+        if not dimensions:
+            return
+        for key, stats in self.dimensions.items():
+            value = dimensions.get(key)
+            if value is None or value == '':
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            stats[0] += 1
+            stats[1] += value
+            if stats[2] is None or value < stats[2]:
+                stats[2] = value
+            if stats[3] is None or value > stats[3]:
+                stats[3] = value
+
+
+class _CellStyles:
+    """
+    工作簿層級的儲存格樣式快取
+    
+    具名樣式與數字格式只解析一次成為 StyleArray（樣式表索引），
+    之後每個儲存格只複製索引陣列，不再逐格以名稱查找具名樣式。
+    """
+    
+    def __init__(self, ws):
+        self._ws = ws
+        self.header = self._resolve('header')
+        self.required = self._resolve('required')
+        self._data = {None: self._resolve('data')}
+    
+    def _resolve(self, style_name: str, number_format: Optional[str] = None):
+        template = openpyxl_cell.WriteOnlyCell(self._ws)
+        template.style = style_name
+        if number_format:
+            template.number_format = number_format
+        return template._style
+    
+    def data(self, number_format: Optional[str]):
+        """資料儲存格樣式（依數字格式快取）"""
+        style = self._data.get(number_format)
+        if style is None:
+            style = self._data[number_format] = self._resolve('data', number_format)
+        return style
+
+
+class _SpooledRows:
+    """以暫存檔保存單一類別的申請資料（每行一筆JSON），可重複迭代"""
+    
+    def __init__(self):
+        self._file = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+        self._count = 0
+    
+    def append(self, app: Dict):
+        self._file.write(json.dumps(app, ensure_ascii=False))
+        self._file.write('\n')
+        self._count += 1
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __iter__(self) -> Iterator[Dict]:
+        self._file.flush()
+        self._file.seek(0)
+        for line in self._file:
+            yield json.loads(line)
+    
+    def close(self):
+        self._file.close()
+
 
 class MaterialExcelProcessor:
     """優化版Excel處理器"""
     
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, config: Optional[Dict] = None):
         """
         初始化處理器
         
         Args:
             config_path: 配置檔案路徑（可選）
+            config: 覆寫配置的字典（可選，優先於配置檔案）
         """
         self.category_mapping = {
             'H': 'Handle',
@@ -66,9 +816,24 @@ class MaterialExcelProcessor:
             self.config = self._load_config(config_path)
         else:
             self.config = self._get_default_config()
+        if config:
+            self.config.update(config)
         
-        # 初始化樣式
-        self._init_styles()
+        # 欄位取值函式、包裝欄位格式化快取與各欄位組合的擷取計畫快取
+        self._packaging_cache = _PackagingFormatCache(
+            self._format_packaging_field, self.config['packaging_cache_size']
+        )
+        self._packaging_getters = self._init_packaging_getters()
+        self._column_getters = self._init_column_getters()
+        self._column_plans = {}
+        self._metrics = _ExportMetrics()
+        # 最近一次分組時累加的摘要統計
+        self._summary_stats = _SummaryAggregator()
+        
+        # 具名樣式於第一次使用時建立（見 _init_styles）
+        self._header_style = None
+        self._data_style = None
+        self._required_style = None
         
         logger.info("Excel處理器初始化完成")
     
@@ -100,6 +865,79 @@ class MaterialExcelProcessor:
             'Others': base_columns + common_columns + packaging_columns
         }
     
+    def _init_column_getters(self) -> Dict[str, Callable[[Dict], Any]]:
+        """初始化各欄位的取值函式（每個匯出欄位對應一個取值函式）"""
+        category_mapping = self.category_mapping
+        format_packaging = self._packaging_cache.format
+        
+        def field(key, default=''):
+            # methodcaller 以C實作，比lambda少一層Python呼叫
+            return methodcaller('get', key, default)
+        
+        def dimension(key):
+            return lambda app: app.get('dimensions', _EMPTY_DICT).get(key, '')
+        
+        def category_field(category, getter):
+            # 類別特殊欄位只在該類別的申請中有值
+            return lambda app: getter(app) if app.get('mainCategory', '') == category else ''
+        
+        def packaging(raw_getter):
+            return lambda app: format_packaging(raw_getter(app))
+        
+        getters = {
+            '料號': field('itemCode'),
+            '料件說明': field('itemNameCN'),
+            '客戶說明': field('itemNameEN'),
+            '產品大類': lambda app: category_mapping.get(app.get('mainCategory', ''), ''),
+            '產品中類': field('subCategory'),
+            '產品小類': field('specCategory'),
+            '料件基本材質': field('material'),
+            '料件外型長': dimension('length'),
+            '料件外型寬': dimension('width'),
+            '料件外型高': dimension('height'),
+            '料件外型重量': dimension('weight'),
+            '料件表面處理': field('surfaceFinish'),
+            'MOQ': field('moq'),
+            '單位': field('unit', 'PCS'),
+            '客戶參考號': field('customerRef'),
+            '供應商編號': field('supplier'),
+            '建立日期': field('submitDate'),
+            '狀態': field('status'),
+            '把手長度': category_field('H', dimension('length')),
+            '孔距': category_field('H', field('handleHoleDistance')),
+            '滑軌長度': category_field('S', dimension('length')),
+            '滑軌載重': category_field('S', field('slideLoad')),
+            '滑軌類型': category_field('S', field('slideType')),
+            '鋼珠大小': category_field('S', field('ballSize'))
+        }
+        
+        # 包裝欄位（先取原始資料再格式化）
+        for key, raw_getter in self._packaging_getters.items():
+            getters[key] = packaging(raw_getter)
+        
+        return getters
+    
+    def _init_packaging_getters(self) -> Dict[str, Callable[[Dict], Any]]:
+        """初始化包裝欄位原始資料的取值函式"""
+        def raw(key):
+            def getter(app):
+                return app.get('packaging', _EMPTY_DICT).get(key, _EMPTY_DICT)
+            return getter
+        
+        def other(app):
+            # Other 以前端的 其他說明 為主，沒有時才查 Other
+            packaging_data = app.get('packaging', _EMPTY_DICT)
+            if '其他說明' in packaging_data:
+                return packaging_data['其他說明']
+            return packaging_data.get('Other', _EMPTY_DICT)
+        
+        getters = {
+            key: raw(key)
+            for key in ['個別產品包裝', '配件內容', '配件', '內盒', '外箱', '運輸與托盤要求', '裝櫃要求']
+        }
+        getters['Other'] = other
+        return getters
+    
     def _get_default_config(self) -> Dict:
         """取得預設配置"""
         return {
@@ -110,87 +948,301 @@ class MaterialExcelProcessor:
             'include_summary': True,
             'include_validation': True,
             'auto_filter': True,
-            'freeze_panes': 'B2'
+            'freeze_panes': 'B2',
+            'write_only': False,
+            'streaming_input': False,
+            'workers': 1,
+            'writer': 'openpyxl',
+            'output_format': 'xlsx',
+            'manifest_path': None,
+            'cache_dir': None,
+            'cache_max_bytes': 1 << 30,
+            'export_date': None,
+            'chunk_rows': None,
+            'packaging_cache_size': 4096,
+            'db_batch_size': 5000,
+            'metrics': False,
+            'metrics_path': None
         }
     
     def _load_config(self, config_path: str) -> Dict:
         """載入配置檔案"""
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                config = self._get_default_config()
+                config.update(json.load(f))
+                return config
         except Exception as e:
             logger.warning(f"載入配置失敗，使用預設配置: {e}")
             return self._get_default_config()
     
     def _init_styles(self):
-        """初始化Excel樣式"""
+        """初始化Excel樣式（第一次使用樣式時才呼叫，避免建立處理器時就匯入openpyxl）"""
         # 標題樣式
-        self.header_style = NamedStyle(name='header')
-        self.header_style.font = Font(bold=True, color='FFFFFF', size=11)
-        self.header_style.fill = PatternFill(
+        self._header_style = openpyxl_styles.NamedStyle(name='header')
+        self._header_style.font = openpyxl_styles.Font(bold=True, color='FFFFFF', size=11)
+        self._header_style.fill = openpyxl_styles.PatternFill(
             start_color='366092',
             end_color='366092',
             fill_type='solid'
         )
-        self.header_style.alignment = Alignment(
+        self._header_style.alignment = openpyxl_styles.Alignment(
             horizontal='center',
             vertical='center',
             wrap_text=True
         )
-        self.header_style.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='medium')
+        self._header_style.border = openpyxl_styles.Border(
+            left=openpyxl_styles.Side(style='thin'),
+            right=openpyxl_styles.Side(style='thin'),
+            top=openpyxl_styles.Side(style='thin'),
+            bottom=openpyxl_styles.Side(style='medium')
         )
         
         # 資料樣式
-        self.data_style = NamedStyle(name='data')
-        self.data_style.font = Font(size=10)
-        self.data_style.alignment = Alignment(
+        self._data_style = openpyxl_styles.NamedStyle(name='data')
+        self._data_style.font = openpyxl_styles.Font(size=10)
+        self._data_style.alignment = openpyxl_styles.Alignment(
             horizontal='left',
             vertical='center',
             wrap_text=True
         )
-        self.data_style.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
+        self._data_style.border = openpyxl_styles.Border(
+            left=openpyxl_styles.Side(style='thin'),
+            right=openpyxl_styles.Side(style='thin'),
+            top=openpyxl_styles.Side(style='thin'),
+            bottom=openpyxl_styles.Side(style='thin')
         )
         
         # 必填欄位樣式
-        self.required_style = NamedStyle(name='required')
-        self.required_style.font = Font(bold=True, color='FF0000', size=11)
-        self.required_style.fill = PatternFill(
+        self._required_style = openpyxl_styles.NamedStyle(name='required')
+        self._required_style.font = openpyxl_styles.Font(bold=True, color='FF0000', size=11)
+        self._required_style.fill = openpyxl_styles.PatternFill(
             start_color='FFEEEE',
             end_color='FFEEEE',
             fill_type='solid'
         )
     
-    def process_json_to_excel(self, json_data: str, output_path: Optional[str] = None) -> str:
+    @property
+    def header_style(self) -> 'openpyxl_styles.NamedStyle':
+        """標題具名樣式"""
+        if self._header_style is None:
+            self._init_styles()
+        return self._header_style
+    
+    @property
+    def data_style(self) -> 'openpyxl_styles.NamedStyle':
+        """資料具名樣式"""
+        if self._data_style is None:
+            self._init_styles()
+        return self._data_style
+    
+    @property
+    def required_style(self) -> 'openpyxl_styles.NamedStyle':
+        """必填欄位具名樣式"""
+        if self._required_style is None:
+            self._init_styles()
+        return self._required_style
+    
+    def process_json_to_excel(self, json_data: str, output_path: Optional[str] = None) -> Optional[str]:
         """
         將JSON資料轉換為Excel檔案
         
+        output_format 為 csv / tsv / parquet 時，各類別分別輸出為獨立檔案，
+        放在以輸出檔名（去除副檔名）命名的資料夾中。設定 manifest_path 時
+        為增量匯出：只輸出清單中沒有或內容已變更的申請。設定 chunk_rows 時
+        為分塊匯出（見 _convert_chunked）。
+        
         Args:
             json_data: JSON格式的申請資料
             output_path: 輸出路徑（可選）
         
         Returns:
-            產生的Excel檔案路徑
+            產生的Excel檔案路徑（或檔案組合資料夾路徑）；增量匯出沒有新增或變更時為None
         """
         logger.info("開始處理JSON資料")
+        self._metrics = _ExportMetrics()
+        
+        # 建立Excel檔案
+        if not output_path:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            output_path = f"SAP_Material_Import_{timestamp}.xlsx"
+        
+        # 分塊匯出：每N筆一個檔案，可從中斷處續傳
+        if self.config['chunk_rows']:
+            if self.config['manifest_path']:
+                raise ValueError("分塊匯出不支援增量匯出清單（manifest_path）")
+            return self._convert_chunked(json_data, output_path)
+        
+        # 增量匯出：未變更的申請在分組時即略過，不做任何映射與寫入
+        manifest = None
+        if self.config['manifest_path']:
+            manifest = _ExportManifest(self.config['manifest_path'])
+        
+        # 輸出快取：相同的已核准資料與設定直接沿用先前產生的檔案
+        # （增量匯出的結果取決於清單狀態，不使用快取）
+        if self.config['cache_dir'] and manifest is None:
+            return self._convert_cached(json_data, output_path)
+        
+        try:
+            result = self._convert_applications(json_data, output_path, manifest)
+            if manifest is not None:
+                manifest.commit()
+                logger.info(f"增量匯出: {manifest.changed} 筆新增或變更, 略過 {manifest.skipped} 筆未變更")
+            return result
+        finally:
+            if manifest is not None:
+                manifest.close()
+    
+    def _convert_chunked(self, json_data: Any, output_path: str) -> str:
+        """
+        分塊匯出：已核准的申請依序每 chunk_rows 筆寫成一個檔案
+        
+        檔案放在以輸出檔名（去除副檔名）命名的資料夾，依序為 <名稱>_0001.xlsx、
+        <名稱>_0002.xlsx ...，同資料夾的 chunks.json 為分塊清單（檔案、筆數、
+        首末申請 id）兼檢查點。分塊先寫在 .partial 子資料夾，完成後才移入並
+        記錄，存檔中斷不會留下不完整的分塊；重新執行相同指令即從下一個分塊繼續。
+        記憶體只保留一個分塊的申請資料。
+        """
+        chunk_rows = self.config['chunk_rows']
+        bundle_dir = os.path.splitext(output_path)[0]
+        base_name = os.path.basename(bundle_dir)
+        extension = OUTPUT_EXTENSIONS[self.config['output_format']]
+        partial_dir = os.path.join(bundle_dir, '.partial')
+        os.makedirs(bundle_dir, exist_ok=True)
+        
+        checkpoint = _ChunkCheckpoint(os.path.join(bundle_dir, 'chunks.json'), self._chunk_fingerprint(json_data))
+        if checkpoint.complete:
+            logger.info(f"✅ 分塊匯出先前已完成: {bundle_dir}（{len(checkpoint.chunks)} 個檔案）")
+            return bundle_dir
+        if checkpoint.chunks:
+            logger.info(f"從檢查點續傳: 已完成 {len(checkpoint.chunks)} 個分塊, {checkpoint.rows} 筆")
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        
+        def write_chunk(chunk: List[Dict]):
+            file_name = f"{base_name}_{len(checkpoint.chunks) + 1:04d}{extension}"
+            os.makedirs(partial_dir, exist_ok=True)
+            result = self._write_workbook(self._categorize_applications(chunk), len(chunk),
+                                          os.path.join(partial_dir, file_name))
+            # 檔案組合輸出（CSV等或多程序）時分塊為資料夾
+            file_name = os.path.basename(result)
+            os.replace(result, os.path.join(bundle_dir, file_name))
+            checkpoint.add(file_name, len(chunk), chunk[0].get('id'), chunk[-1].get('id'))
+            logger.info(f"分塊完成: {file_name} ({len(chunk)} 筆, 累計 {checkpoint.rows} 筆)")
+        
+        approved = (app for app in self._iter_applications(json_data) if app.get('status') == 'APPROVED')
+        chunk = []
+        with self._metrics.stage('chunks') as record:
+            # 續傳時略過已完成分塊的申請
+            for app in islice(approved, checkpoint.rows, None):
+                chunk.append(app)
+                if len(chunk) >= chunk_rows:
+                    write_chunk(chunk)
+                    chunk = []
+            if chunk:
+                write_chunk(chunk)
+            record['rows'] = checkpoint.rows
+        
+        checkpoint.finish()
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        logger.info(f"✅ 分塊匯出完成: {bundle_dir}（{len(checkpoint.chunks)} 個檔案, {checkpoint.rows} 筆）")
+        self._emit_metrics(checkpoint.rows)
+        return bundle_dir
+    
+    def _chunk_fingerprint(self, json_data: Any) -> Dict[str, Any]:
+        """
+        分塊匯出的輸入與設定識別
+        
+        檔案輸入以路徑、大小與修改時間識別；記憶體中的資料無法識別，
+        續傳時假設與先前相同。
+        """
+        source = None
+        if isinstance(json_data, str) and os.path.isfile(json_data):
+            stat = os.stat(json_data)
+            source = {'path': os.path.abspath(json_data), 'size': stat.st_size, 'mtime': stat.st_mtime}
+        
+        settings = {
+            key: self.config[key]
+            for key in ('chunk_rows', 'output_format', 'writer', 'max_rows_per_sheet', 'include_summary')
+        }
+        return {'source': source, 'settings': settings}
+    
+    def _convert_cached(self, json_data: Any, output_path: str) -> str:
+        """
+        經由輸出快取轉換
+        
+        摘要的匯出日期為快取內容產生的時間；需要逐次可重現的輸出時
+        可設定 export_date 固定匯出日期（export_date 也是快取鍵的一部分）。
+        """
+        cache = _OutputCache(self.config['cache_dir'], self.config['cache_max_bytes'])
+        is_bundle = self.config['workers'] > 1 or self.config['output_format'] != 'xlsx'
+        entry_path = cache.entry_path(self._cache_key(json_data), is_bundle)
+        result_path = os.path.splitext(output_path)[0] if is_bundle else output_path
+        
+        if cache.get(entry_path, result_path):
+            logger.info(f"✅ 使用快取輸出: {result_path}")
+            return result_path
+        
+        result_path = self._convert_applications(json_data, output_path)
+        cache.put(entry_path, result_path)
+        return result_path
+    
+    def _cache_key(self, json_data: Any) -> str:
+        """
+        計算輸出快取鍵
+        
+        涵蓋已核准申請（依序、鍵排序後序列化）、總申請數、
+        有效設定（快取設定除外）與各類別欄位配置。
+        """
+        digest = hashlib.sha256()
+        total_count = 0
+        for app in self._iter_applications(json_data):
+            total_count += 1
+            if app.get('status') == 'APPROVED':
+                digest.update(json.dumps(app, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8'))
+                digest.update(b'\n')
+        
+        config = {
+            key: value for key, value in self.config.items()
+            if key not in ('cache_dir', 'cache_max_bytes')
+        }
+        digest.update(json.dumps(
+            [total_count, config, self.category_columns, self.category_mapping],
+            ensure_ascii=False, sort_keys=True, default=str
+        ).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _convert_applications(self, json_data: Any, output_path: str,
+                              manifest: Optional[_ExportManifest] = None) -> Optional[str]:
+        """解析、分組並輸出申請資料（增量匯出沒有新增或變更的申請時不產生檔案，回傳None）"""
+        metrics = self._metrics
+        
+        # 串流讀取：逐筆解析並暫存至各類別暫存檔，不保留完整資料
+        if self.config['streaming_input']:
+            try:
+                with metrics.stage('parse_categorize') as record:
+                    categorized, total_count = self._spool_applications(
+                        self._iter_applications(json_data), manifest
+                    )
+                    record['rows'] = total_count
+            except Exception as e:
+                logger.error(f"JSON解析失敗: {e}")
+                raise
+            logger.info(f"解析到 {total_count} 筆申請資料")
+            try:
+                result = None
+                if not self._is_empty_delta(categorized, manifest):
+                    result = self._write_workbook(categorized, total_count, output_path)
+            finally:
+                for spool in categorized.values():
+                    spool.close()
+            self._emit_metrics(total_count)
+            return result
         
         # 解析JSON資料
         try:
-            if isinstance(json_data, str):
-                if os.path.isfile(json_data):
-                    with open(json_data, 'r', encoding='utf-8') as f:
-                        applications = json.load(f)
-                else:
-                    applications = json.loads(json_data)
-            else:
-                applications = json_data
+            with metrics.stage('parse') as record:
+                applications = self._load_applications(json_data)
+                record['rows'] = len(applications)
         except Exception as e:
             logger.error(f"JSON解析失敗: {e}")
             raise
@@ -198,42 +1250,71 @@ class MaterialExcelProcessor:
         logger.info(f"解析到 {len(applications)} 筆申請資料")
         
         # 按類別分組
-        categorized = self._categorize_applications(applications)
-        
-        # 建立Excel檔案
-        if not output_path:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            output_path = f"SAP_Material_Import_{timestamp}.xlsx"
-        
-        # 建立工作簿
-        wb = openpyxl.Workbook()
+        with metrics.stage('categorize') as record:
+            categorized = self._categorize_applications(applications, manifest)
+            record['rows'] = len(applications)
+        
+        result = None
+        if not self._is_empty_delta(categorized, manifest):
+            result = self._write_workbook(categorized, len(applications), output_path)
+        self._emit_metrics(len(applications))
+        return result
+    
+    @staticmethod
+    def _is_empty_delta(categorized: Dict, manifest: Optional[_ExportManifest]) -> bool:
+        """增量匯出且沒有任何新增或變更的申請時，略過輸出（重複執行的常態，不產生空白檔案）"""
+        if manifest is None or any(map(len, categorized.values())):
+            return False
+        logger.info("增量匯出: 沒有新增或變更的申請，不產生檔案")
+        return True
+    
+    def _emit_metrics(self, input_rows: int):
+        """啟用指標時，以結構化日誌輸出各階段指標並可寫入JSON檔"""
+        if not (self.config['metrics'] or self.config['metrics_path']):
+            return
+        
+        report = self._metrics.report(input_rows)
+        # 包裝欄位格式化快取為處理器層級，命中數自建立處理器起累計
+        report['packaging_cache'] = self._packaging_cache.stats()
+        for name, stage in report['stages'].items():
+            logger.info(f"匯出指標 {json.dumps(dict(stage, stage=name), ensure_ascii=False)}")
+        logger.info(f"匯出指標 {json.dumps({k: v for k, v in report.items() if k not in ('stages', 'sheets')}, ensure_ascii=False)}")
+        
+        if self.config['metrics_path']:
+            with open(self.config['metrics_path'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            logger.info(f"指標已寫入: {self.config['metrics_path']}")
+    
+    def _write_workbook(self, categorized: Dict, total_count: int, output_path: str) -> str:
+        """依分組結果建立工作簿並儲存"""
+        # 多程序模式或非xlsx格式：各類別（分片）分別產生檔案
+        if self.config['workers'] > 1 or self.config['output_format'] != 'xlsx':
+            return self._write_bundle(categorized, total_count, output_path)
         
-        # 註冊樣式
-        if self.header_style.name not in wb.named_styles:
-            wb.add_named_style(self.header_style)
-        if self.data_style.name not in wb.named_styles:
-            wb.add_named_style(self.data_style)
-        if self.required_style.name not in wb.named_styles:
-            wb.add_named_style(self.required_style)
+        writer = self._open_writer(output_path)
         
-        # 移除預設工作表
-        wb.remove(wb.active)
+        # 依每張工作表最大筆數規劃分片
+        shard_plans = self._plan_category_shards(categorized)
         
         # 建立摘要工作表（如果啟用）
         if self.config['include_summary']:
-            self._create_summary_sheet(wb, categorized, applications)
+            with self._metrics.stage('summary'):
+                writer.write_summary(categorized, total_count, shard_plans)
         
-        # 為每個類別建立工作表
+        # 為每個類別建立工作表（超過上限時依序寫入各分片）
         for category_code, apps in categorized.items():
             if apps:
                 sheet_name = self.category_mapping.get(category_code, 'Others')
-                logger.info(f"建立工作表: {sheet_name} ({len(apps)} 筆資料)")
-                ws = wb.create_sheet(sheet_name)
-                self._write_category_sheet(ws, sheet_name, apps)
+                rows = iter(apps)
+                for shard_name, start, end in shard_plans[category_code]:
+                    logger.info(f"建立工作表: {shard_name} ({end - start + 1} 筆資料)")
+                    self._write_category_timed(writer, shard_name, sheet_name,
+                                               islice(rows, end - start + 1), end - start + 1)
         
         # 儲存檔案
         try:
-            wb.save(output_path)
+            with self._metrics.stage('save'):
+                writer.save()
             logger.info(f"✅ Excel檔案已成功產生: {output_path}")
         except Exception as e:
             logger.error(f"儲存檔案失敗: {e}")
@@ -241,83 +1322,529 @@ class MaterialExcelProcessor:
         
         return output_path
     
-    def _categorize_applications(self, applications: List[Dict]) -> Dict[str, List]:
-        """按類別分組申請資料"""
-        categorized = {}
-        for app in applications:
-            # 只處理已核准的申請
-            if app.get('status') != 'APPROVED':
-                continue
-                
-            category = app.get('mainCategory', 'O')
-            if category not in categorized:
-                categorized[category] = []
-            categorized[category].append(app)
-        return categorized
-    
-    def _create_summary_sheet(self, wb, categorized: Dict, applications: List):
-        """建立摘要工作表"""
-        ws = wb.create_sheet('Summary', 0)
-        
-        # 標題
-        ws.merge_cells('A1:F1')
-        ws['A1'] = '物料申請匯出摘要'
-        ws['A1'].font = Font(bold=True, size=16, color='366092')
-        ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-        
-        # 基本資訊
-        ws['A3'] = '匯出日期：'
-        ws['B3'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    def _write_bundle(self, categorized: Dict, total_count: int, output_path: str) -> str:
+        """
+        將各類別（分片）分別寫成獨立檔案，輸出為多檔案組合
         
-        ws['A4'] = '總申請數：'
-        ws['B4'] = len(applications)
+        每個分片依 output_format 寫成獨立檔案，與摘要檔案一同放在以
+        輸出檔名（去除副檔名）命名的資料夾中；workers 大於1時以多程序平行產生。
         
-        ws['A5'] = '已核准數：'
-        approved = [a for a in applications if a.get('status') == 'APPROVED']
-        ws['B5'] = len(approved)
+        Returns:
+            輸出資料夾路徑
+        """
+        workers = self.config['workers']
+        extension = OUTPUT_EXTENSIONS[self.config['output_format']]
+        bundle_dir = os.path.splitext(output_path)[0]
+        os.makedirs(bundle_dir, exist_ok=True)
+        logger.info(f"以 {workers} 個工作程序產生檔案組合: {bundle_dir}")
         
-        # 類別統計
-        ws['A7'] = '類別統計'
-        ws['A7'].font = Font(bold=True, size=12)
+        shard_plans = self._plan_category_shards(categorized)
         
-        row = 8
-        ws[f'A{row}'] = '類別'
-        ws[f'B{row}'] = '數量'
-        ws[f'C{row}'] = '百分比'
+        # 摘要檔案在主程序產生
+        if self.config['include_summary']:
+            with self._metrics.stage('summary'):
+                writer = self._open_writer(os.path.join(bundle_dir, f"Summary{extension}"))
+                writer.write_summary(categorized, total_count, shard_plans)
+                writer.save()
+        
+        if workers <= 1:
+            for category_code, apps in categorized.items():
+                if not apps:
+                    continue
+                sheet_name = self.category_mapping.get(category_code, 'Others')
+                rows = iter(apps)
+                for shard_name, start, end in shard_plans[category_code]:
+                    logger.info(f"建立檔案: {shard_name}{extension} ({end - start + 1} 筆資料)")
+                    self._write_sheet_file(sheet_name, shard_name, islice(rows, end - start + 1),
+                                           os.path.join(bundle_dir, f"{shard_name}{extension}"),
+                                           end - start + 1)
+            logger.info(f"✅ 檔案組合已成功產生: {bundle_dir}")
+            return bundle_dir
+        
+        # 工作程序內的階段耗時無法回傳，僅記錄整體時間
+        with self._metrics.stage('bundle_workers') as record, \
+                ProcessPoolExecutor(max_workers=workers) as executor:
+            record['rows'] = sum(len(apps) for apps in categorized.values())
+            pending = set()
+            for category_code, apps in categorized.items():
+                if not apps:
+                    continue
+                sheet_name = self.category_mapping.get(category_code, 'Others')
+                rows = iter(apps)
+                for shard_name, start, end in shard_plans[category_code]:
+                    # 限制排隊中的分片數，避免所有分片資料同時留在記憶體
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    
+                    logger.info(f"排入工作表: {shard_name} ({end - start + 1} 筆資料)")
+                    pending.add(executor.submit(
+                        _write_sheet_file_worker,
+                        self.config,
+                        sheet_name,
+                        shard_name,
+                        list(islice(rows, end - start + 1)),
+                        os.path.join(bundle_dir, f"{shard_name}{extension}")
+                    ))
+            
+            for future in wait(pending).done:
+                future.result()
         
-        for col in ['A', 'B', 'C']:
-            ws[f'{col}{row}'].style = 'header'
+        logger.info(f"✅ 檔案組合已成功產生: {bundle_dir}")
+        return bundle_dir
+    
+    def _write_sheet_file(self, sheet_name: str, shard_name: str, applications: Iterable[Dict],
+                          output_path: str, row_count: Optional[int] = None) -> str:
+        """將單一類別（分片）寫成獨立的檔案"""
+        writer = self._open_writer(output_path)
+        if row_count is None:
+            row_count = len(applications)
+        self._write_category_timed(writer, shard_name, sheet_name, applications, row_count)
+        with self._metrics.stage('save'):
+            writer.save()
+        return output_path
+    
+    def _write_category_timed(self, writer, shard_name: str, sheet_name: str,
+                              applications: Iterable[Dict], row_count: int):
+        """寫入類別工作表並記錄 write_rows 階段（含資料擷取與儲存格寫入）"""
+        columns = self.category_columns.get(sheet_name, self.category_columns['Others'])
+        with self._metrics.stage('write_rows') as record:
+            writer.write_category(shard_name, sheet_name, applications)
+            record.update(sheet=shard_name, rows=row_count, cells=row_count * len(columns))
+    
+    def _open_writer(self, output_path: str):
+        """依設定建立寫入器（CSV / TSV / Parquet，或 openpyxl / xlsxwriter 工作簿）"""
+        output_format = self.config['output_format']
+        if output_format == 'csv':
+            return _DelimitedFileWriter(self, output_path, ',')
+        if output_format == 'tsv':
+            return _DelimitedFileWriter(self, output_path, '\t')
+        if output_format == 'parquet':
+            return _ParquetFileWriter(self, output_path)
+        if self.config['writer'] == 'xlsxwriter':
+            return _XlsxWriterWorkbookWriter(self, output_path)
+        return _OpenpyxlWorkbookWriter(self, output_path)
+    
+    def _new_workbook(self):
+        """建立已註冊樣式且無預設工作表的工作簿"""
+        # 串流模式使用write-only工作表，逐列寫出不保留儲存格
+        write_only = self.config['write_only']
+        wb = openpyxl.Workbook(write_only=write_only)
         
-        row += 1
-        total_approved = len(approved)
+        # 註冊樣式
+        self._register_styles(wb)
         
+        # 移除預設工作表（write-only工作簿沒有預設工作表）
+        if not write_only:
+            wb.remove(wb.active)
+        return wb
+    
+    def _plan_category_shards(self, categorized: Dict) -> Dict[str, List[tuple]]:
+        """依每張工作表最大筆數規劃各類別的分片（僅xlsx有列數上限）"""
+        shard_plans = {}
         for category_code, apps in categorized.items():
-            category_name = self.category_mapping.get(category_code, 'Others')
-            ws[f'A{row}'] = category_name
-            ws[f'B{row}'] = len(apps)
-            if total_approved > 0:
-                ws[f'C{row}'] = f"{(len(apps) / total_approved * 100):.1f}%"
-            else:
-                ws[f'C{row}'] = "0%"
-            row += 1
-        
-        # 調整欄寬
+            if apps:
+                sheet_name = self.category_mapping.get(category_code, 'Others')
+                if self.config['output_format'] == 'xlsx':
+                    shard_plans[category_code] = self._plan_shards(sheet_name, len(apps))
+                else:
+                    shard_plans[category_code] = [(sheet_name, 1, len(apps))]
+        return shard_plans
+    
+    def _register_styles(self, wb):
+        """註冊具名樣式"""
+        if self.header_style.name not in wb.named_styles:
+            wb.add_named_style(self.header_style)
+        if self.data_style.name not in wb.named_styles:
+            wb.add_named_style(self.data_style)
+        if self.required_style.name not in wb.named_styles:
+            wb.add_named_style(self.required_style)
+    
+    def _plan_shards(self, sheet_name: str, row_count: int) -> List[tuple]:
+        """
+        依 max_rows_per_sheet 規劃工作表分片
+        
+        未超過上限時沿用原工作表名稱；超過時命名為 Handle_001、Handle_002 ...
+        
+        Returns:
+            [(工作表名稱, 起始筆數, 結束筆數), ...]，筆數以1起算且不含標題列
+        """
+        max_rows = self.config['max_rows_per_sheet']
+        if not max_rows or row_count <= max_rows:
+            return [(sheet_name, 1, row_count)]
+        
+        shards = []
+        for shard_idx, start in enumerate(range(0, row_count, max_rows), 1):
+            end = min(start + max_rows, row_count)
+            shards.append((f"{sheet_name}_{shard_idx:03d}", start + 1, end))
+        return shards
+    
+    def _logical_sheet_name(self, sheet_name: str) -> str:
+        """將分片工作表名稱（如 Handle_002）還原為類別工作表名稱"""
+        match = SHARD_SHEET_PATTERN.match(sheet_name)
+        if match and match.group(1) in self.category_columns:
+            return match.group(1)
+        return sheet_name
+    
+    def _load_applications(self, json_data: Any) -> List[Dict]:
+        """一次載入全部申請資料（JSON陣列或JSON Lines）"""
+        if isinstance(json_data, str):
+            if os.path.isfile(json_data):
+                # 逐筆解析，不將整個檔案讀成一個字串（大檔時也比 json.load 快）
+                return list(self._iter_applications(json_data))
+            return json.loads(json_data)
+        # 資料庫來源等可迭代物件
+        return json_data if isinstance(json_data, list) else list(json_data)
+    
+    def _iter_applications(self, json_data: Any) -> Iterator[Dict]:
+        """
+        逐筆讀取申請資料
+        
+        檔案輸入時以增量方式解析JSON陣列（有安裝ijson時使用ijson）
+        或逐行解析JSON Lines，不會一次載入整個檔案。.gz / .bz2 / .zst
+        壓縮檔直接串流解壓縮，未壓縮檔以記憶體對映讀取。
+        """
+        if isinstance(json_data, str):
+            if os.path.isfile(json_data):
+                with self._open_input(json_data) as f:
+                    if self._is_json_lines(json_data):
+                        yield from self._iter_json_lines(f)
+                    elif ijson.available:
+                        yield from ijson.items(f, 'item', use_float=True)
+                    else:
+                        yield from self._iter_json_array(codecs.getreader('utf-8')(f))
+            else:
+                yield from json.loads(json_data)
+        else:
+            yield from json_data
+    
+    @contextmanager
+    def _open_input(self, file_path: str):
+        """
+        以二進位串流開啟輸入檔
+        
+        壓縮檔依副檔名串流解壓縮，不產生暫存檔；未壓縮檔以唯讀記憶體對映
+        開啟，由作業系統分頁載入，不經過Python的讀取緩衝區。
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == '.gz':
+            stream = gzip.open(file_path, 'rb')
+        elif extension == '.bz2':
+            stream = bz2.open(file_path, 'rb')
+        elif extension == '.zst':
+            if not zstandard.available:
+                raise ImportError('讀取 .zst 壓縮檔需安裝zstandard套件')
+            raw = open(file_path, 'rb')
+            # stream_reader 沒有 readline，以 BufferedReader 包裝供逐行讀取
+            stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+        elif os.path.getsize(file_path) == 0:
+            # 空檔案無法記憶體對映
+            stream = open(file_path, 'rb')
+        else:
+            with open(file_path, 'rb') as f:
+                stream = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        try:
+            yield stream
+        finally:
+            stream.close()
+    
+    def _is_json_lines(self, file_path: str) -> bool:
+        """依副檔名判斷是否為JSON Lines / NDJSON（忽略壓縮副檔名，如 data.jsonl.gz）"""
+        root, extension = os.path.splitext(file_path.lower())
+        if extension in INPUT_COMPRESSIONS:
+            extension = os.path.splitext(root)[1]
+        return extension in ('.jsonl', '.ndjson')
+    
+    def _iter_json_lines(self, f) -> Iterator[Dict]:
+        """逐行解析JSON Lines（二進位串流，json.loads 直接解碼位元組），略過空白行"""
+        for line in iter(f.readline, b''):
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    
+    def _iter_json_array(self, f, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+        """
+        以固定大小區塊讀取並增量解析頂層JSON陣列
+        
+        與 json.load 同樣嚴格：元素之間必須以逗號分隔、不接受結尾逗號，
+        陣列結束後只允許空白，格式錯誤時拋出 json.JSONDecodeError。
+        """
+        decoder = json.JSONDecoder()
+        buffer = ''
+        eof = False
+        started = False
+        # 'value'：陣列開頭；'separator'：元素之後，應為 , 或 ]；'next'：逗號之後，必須是元素
+        expect = 'value'
+        
+        while True:
+            buffer = buffer.lstrip()
+            # 緩衝區不足時補讀
+            if not buffer and not eof:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    eof = True
+                buffer += chunk
+                continue
+            
+            if not started:
+                if not buffer.startswith('['):
+                    raise ValueError('JSON資料必須為陣列')
+                buffer = buffer[1:]
+                started = True
+                continue
+            
+            if not buffer:
+                raise ValueError('JSON陣列不完整')
+            
+            if buffer.startswith(']') and expect != 'next':
+                self._check_json_array_end(f, buffer[1:], chunk_size)
+                return
+            if expect == 'separator':
+                if not buffer.startswith(','):
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, 0)
+                buffer = buffer[1:]
+                expect = 'next'
+                continue
+            
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                end = None
+            else:
+                rest = buffer[end:].lstrip()
+            # 物件跨越區塊邊界，或數值被區塊邊界截斷（如 1.5 只讀到 1.），補讀後重試
+            if not eof and (end is None or not rest
+                            or (type(item) in (int, float) and buffer[end] in '.eE+-0123456789')):
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    eof = True
+                buffer += chunk
+                continue
+            if end is None:
+                # 已讀到檔尾仍無法解析（包含結尾逗號），拋出原本的解析錯誤
+                decoder.raw_decode(buffer)
+            
+            yield item
+            buffer = rest
+            expect = 'separator'
+    
+    def _check_json_array_end(self, f, rest: str, chunk_size: int):
+        """頂層陣列結束後只允許空白，與 json.load 相同"""
+        while True:
+            if rest.strip():
+                raise json.JSONDecodeError('Extra data', rest, len(rest) - len(rest.lstrip()))
+            rest = f.read(chunk_size)
+            if not rest:
+                return
+    
+    def _spool_applications(self, applications: Iterable[Dict],
+                            manifest: Optional[_ExportManifest] = None) -> tuple:
+        """
+        逐筆過濾已核准申請並寫入各類別暫存檔（增量匯出時略過未變更的申請）
+        
+        Returns:
+            (類別代碼對應暫存資料的字典, 總申請數)
+        """
+        categorized = {}
+        total_count = 0
+        summary = self._summary_stats = _SummaryAggregator()
+        try:
+            for app in applications:
+                total_count += 1
+                # 只處理已核准的申請
+                if app.get('status') != 'APPROVED':
+                    continue
+                if manifest is not None and not manifest.is_changed(app):
+                    continue
+                
+                category = app.get('mainCategory', 'O')
+                if category not in self.category_mapping:
+                    # 未知類別併入Others，避免同名工作表與分片名稱衝突
+                    category = 'O'
+                if category not in categorized:
+                    categorized[category] = _SpooledRows()
+                categorized[category].append(app)
+                summary.add(app, category)
+        except Exception:
+            for spool in categorized.values():
+                spool.close()
+            raise
+        return categorized, total_count
+    
+    def _categorize_applications(self, applications: List[Dict],
+                                 manifest: Optional[_ExportManifest] = None) -> Dict[str, List]:
+        """按類別分組申請資料（增量匯出時略過未變更的申請），同時累加摘要統計"""
+        categorized = {}
+        summary = self._summary_stats = _SummaryAggregator()
+        for app in applications:
+            # 只處理已核准的申請
+            if app.get('status') != 'APPROVED':
+                continue
+            if manifest is not None and not manifest.is_changed(app):
+                continue
+                
+            category = app.get('mainCategory', 'O')
+            if category not in self.category_mapping:
+                # 未知類別併入Others，避免同名工作表與分片名稱衝突
+                category = 'O'
+            if category not in categorized:
+                categorized[category] = []
+            categorized[category].append(app)
+            summary.add(app, category)
+        return categorized
+    
+    def _create_summary_sheet(self, wb, categorized: Dict, total_count: int,
+                              shard_plans: Optional[Dict] = None):
+        """建立摘要工作表"""
+        ws = wb.create_sheet('Summary', 0)
+        write_only = wb.write_only
+        
+        # 調整欄寬（write-only模式須在寫入第一列前設定）
         for col in ['A', 'B', 'C']:
             ws.column_dimensions[col].width = 20
+        
+        # 標題合併儲存格
+        if write_only:
+            ws.merged_cells.add('A1:F1')
+        else:
+            ws.merge_cells('A1:F1')
+        
+        for row_idx, (kind, values) in enumerate(self._build_summary_rows(categorized, total_count, shard_plans), 1):
+            cells = []
+            for col_idx, value in enumerate(values, 1):
+                if write_only:
+                    cell = openpyxl_cell.WriteOnlyCell(ws, value=value)
+                else:
+                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
+                self._apply_summary_style(cell, kind)
+                cells.append(cell)
+            if write_only:
+                ws.append(cells)
+    
+    def _build_summary_rows(self, categorized: Dict, total_count: int,
+                            shard_plans: Optional[Dict] = None) -> List[tuple]:
+        """產生摘要工作表內容，每列為 (列類型, 值列表)"""
+        # 分組結果只含已核准申請
+        total_approved = sum(len(apps) for apps in categorized.values())
+        
+        rows = [
+            # 標題
+            ('title', ['物料申請匯出摘要']),
+            ('blank', []),
+            # 基本資訊
+            ('data', ['匯出日期：', self.config['export_date'] or datetime.now().strftime('%Y-%m-%d %H:%M:%S')]),
+            ('data', ['總申請數：', total_count]),
+            ('data', ['已核准數：', total_approved]),
+            ('blank', []),
+            # 類別統計
+            ('section', ['類別統計']),
+            ('header', ['類別', '數量', '百分比'])
+        ]
+        
+        for category_code, apps in categorized.items():
+            category_name = self.category_mapping.get(category_code, 'Others')
+            if total_approved > 0:
+                percentage = f"{(len(apps) / total_approved * 100):.1f}%"
+            else:
+                percentage = "0%"
+            rows.append(('category', [category_name, len(apps), percentage]))
+        
+        rows.extend(self._build_statistics_rows(total_approved))
+        
+        # 分片明細（僅在有類別超過每張工作表上限時列出）
+        sharded = [plan for plan in (shard_plans or {}).values() if len(plan) > 1]
+        if sharded:
+            rows.append(('blank', []))
+            rows.append(('section', ['分片明細']))
+            rows.append(('header', ['工作表', '起始筆數', '結束筆數']))
+            for plan in sharded:
+                for shard_name, start, end in plan:
+                    rows.append(('data', [shard_name, start, end]))
+        
+        return rows
+    
+    def _build_statistics_rows(self, total_approved: int) -> List[tuple]:
+        """由分組時累加的統計產生中類 / 小類、供應商、單位與尺寸重量統計列"""
+        summary = self._summary_stats
+        
+        def percentage(count):
+            return f"{(count / total_approved * 100):.1f}%" if total_approved > 0 else "0%"
+        
+        rows = [
+            ('blank', []),
+            ('section', ['中類 / 小類統計']),
+            ('header', ['類別', '中類', '小類', '數量'])
+        ]
+        category_order = list(self.category_mapping)
+        for (category, sub_category, spec_category), count in sorted(
+            summary.categories.items(),
+            key=lambda item: (category_order.index(item[0][0]), str(item[0][1]), str(item[0][2]))
+        ):
+            rows.append(('data', [self.category_mapping[category], sub_category, spec_category, count]))
+        
+        for title, header, counts in [
+            ('供應商統計', '供應商編號', summary.suppliers),
+            ('單位統計', '單位', summary.units)
+        ]:
+            rows.append(('blank', []))
+            rows.append(('section', [title]))
+            rows.append(('header', [header, '數量', '百分比']))
+            # 依數量由多到少
+            for key, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0]))):
+                rows.append(('data', [key, count, percentage(count)]))
+        
+        rows.append(('blank', []))
+        rows.append(('section', ['尺寸與重量統計']))
+        rows.append(('header', ['項目', '最小值', '最大值', '平均值', '筆數']))
+        for key, label in _SummaryAggregator.DIMENSIONS:
+            count, total, minimum, maximum = summary.dimensions[key]
+            mean = round(total / count, self.config['decimal_places']) if count else None
+            rows.append(('data', [label, minimum, maximum, mean, count]))
+        
+        return rows
+    
+    def _apply_summary_style(self, cell, kind: str):
+        """套用摘要工作表儲存格樣式（一般與write-only儲存格皆適用）"""
+        if kind == 'title':
+            cell.font = openpyxl_styles.Font(bold=True, size=16, color='366092')
+            cell.alignment = openpyxl_styles.Alignment(horizontal='center', vertical='center')
+        elif kind == 'section':
+            cell.font = openpyxl_styles.Font(bold=True, size=12)
+        elif kind == 'header':
+            cell.style = 'header'
     
-    def _write_category_sheet(self, ws, sheet_name: str, applications: List[Dict]):
-        """寫入特定類別的工作表"""
+    def _write_category_sheet(self, ws, sheet_name: str, applications: Iterable[Dict],
+                              styles: Optional[_CellStyles] = None):
+        """
+        寫入特定類別的工作表
+        
+        styles 為同一工作簿共用的樣式快取；未提供時依此工作表建立。
+        """
         # 取得該類別的欄位
         columns = self.category_columns.get(sheet_name, self.category_columns['Others'])
         
+        # 依引擎擷取各列的值與數字格式
+        rows = self._extract_rows(columns, applications)
+        
+        if styles is None:
+            styles = _CellStyles(ws)
+        
+        if ws.parent.write_only:
+            self._write_category_sheet_streaming(ws, columns, rows, styles)
+            return
+        
         # 寫入標題
+        header_style = styles.header
         for col_idx, column_name in enumerate(columns, 1):
             cell = ws.cell(row=1, column=col_idx, value=column_name)
-            cell.style = 'header'
+            cell._style = copy(header_style)
         
         # 寫入資料
-        for row_idx, app in enumerate(applications, 2):
-            self._write_application_row(ws, row_idx, app, columns)
+        max_row = 1
+        for max_row, extracted in enumerate(rows, 2):
+            self._write_application_row(ws, max_row, extracted, styles)
         
         # 設定自動篩選
         if self.config['auto_filter']:
@@ -332,84 +1859,101 @@ class MaterialExcelProcessor:
         
         # 加入資料驗證（如果啟用）
         if self.config['include_validation']:
-            self._add_data_validation(ws, len(applications) + 1)
+            self._add_data_validation(ws, max_row, columns)
     
-    def _write_application_row(self, ws, row_idx: int, app: Dict, columns: List[str]):
-        """寫入單筆申請資料"""
-        # 資料映射
-        data_mapping = self._create_data_mapping(app)
+    def _write_category_sheet_streaming(self, ws, columns: List[str], rows: Iterable[tuple],
+                                        styles: _CellStyles):
+        """以write-only模式寫入類別工作表，資料列逐列附加"""
+        # write-only工作表的欄寬與凍結窗格須在寫入第一列前設定
+        if self.config['freeze_panes']:
+            ws.freeze_panes = self.config['freeze_panes']
+        self._adjust_column_widths(ws, columns)
         
-        # 寫入每個欄位
-        for col_idx, column_name in enumerate(columns, 1):
-            value = data_mapping.get(column_name, '')
+        # 每個儲存格只複製預先解析的樣式索引
+        header_style = styles.header
+        data_style = styles.data
+        
+        header_row = []
+        for column_name in columns:
+            cell = openpyxl_cell.WriteOnlyCell(ws, value=column_name)
+            cell._style = copy(header_style)
+            header_row.append(cell)
+        ws.append(header_row)
+        
+        row_count = 0
+        for values, number_formats in rows:
+            row = []
+            for value, number_format in zip(values, number_formats):
+                cell = openpyxl_cell.WriteOnlyCell(ws, value=value)
+                cell._style = copy(data_style(number_format))
+                row.append(cell)
+            ws.append(row)
+            row_count += 1
+        
+        max_row = row_count + 1
+        
+        # 設定自動篩選（write-only工作表無法計算dimensions，依欄列數推算）
+        if self.config['auto_filter']:
+            ws.auto_filter.ref = f"A1:{openpyxl_utils.get_column_letter(len(columns))}{max_row}"
+        
+        # 加入資料驗證（如果啟用）
+        if self.config['include_validation']:
+            self._add_data_validation(ws, max_row, columns)
+    
+    def _extract_rows(self, columns: List[str], applications: Iterable[Dict]) -> Iterator[tuple]:
+        """依擷取計畫逐列產生 (值列表, 數字格式列表)"""
+        return map(self._get_column_plan(columns).extract, applications)
+    
+    def _write_application_row(self, ws, row_idx: int, extracted: tuple, styles: _CellStyles):
+        """寫入單筆申請資料（extracted 為擷取計畫產生的值與數字格式）"""
+        values, number_formats = extracted
+        data_style = styles.data
+        for col_idx, (value, number_format) in enumerate(zip(values, number_formats), 1):
             cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.style = 'data'
-            
-            # 特殊格式處理
-            if '重量' in column_name or '長度' in column_name or '寬度' in column_name or '高度' in column_name:
-                try:
-                    if value:
-                        cell.value = float(value)
-                        cell.number_format = '#,##0.00'
-                except:
-                    pass
-            elif '日期' in column_name:
-                if value:
-                    try:
-                        date_obj = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                        cell.value = date_obj.strftime(self.config['date_format'])
-                    except:
-                        pass
-    
-    def _create_data_mapping(self, app: Dict) -> Dict[str, Any]:
-        """建立資料映射"""
-        # 基本資料映射
-        data_mapping = {
-            '料號': app.get('itemCode', ''),
-            '料件說明': app.get('itemNameCN', ''),
-            '客戶說明': app.get('itemNameEN', ''),
-            '產品大類': self.category_mapping.get(app.get('mainCategory', ''), ''),
-            '產品中類': app.get('subCategory', ''),
-            '產品小類': app.get('specCategory', ''),
-            '料件基本材質': app.get('material', ''),
-            '料件外型長': app.get('dimensions', {}).get('length', ''),
-            '料件外型寬': app.get('dimensions', {}).get('width', ''),
-            '料件外型高': app.get('dimensions', {}).get('height', ''),
-            '料件外型重量': app.get('dimensions', {}).get('weight', ''),
-            '料件表面處理': app.get('surfaceFinish', ''),
-            'MOQ': app.get('moq', ''),
-            '單位': app.get('unit', 'PCS'),
-            '客戶參考號': app.get('customerRef', ''),
-            '供應商編號': app.get('supplier', ''),
-            '建立日期': app.get('submitDate', ''),
-            '狀態': app.get('status', '')
-        }
+            cell._style = copy(data_style(number_format))
+    
+    def _get_column_plan(self, columns: List[str]) -> '_ColumnPlan':
+        """
+        取得欄位擷取計畫（每組欄位只編譯一次）
         
-        # 包裝資料映射
-        packaging = app.get('packaging', {})
-        for key in ['個別產品包裝', '配件內容', '配件', '內盒', '外箱', '運輸與托盤要求', '裝櫃要求', 'Other']:
-            # 相容性處理
-            packaging_key = key
-            if key == 'Other':
-                packaging_key = '其他說明'
-            
-            field_data = packaging.get(packaging_key, packaging.get(key, {}))
-            data_mapping[key] = self._format_packaging_field(field_data)
-        
-        # 特殊欄位處理（根據類別）
-        main_category = app.get('mainCategory', '')
-        if main_category == 'H':
-            # Handle特殊欄位
-            data_mapping['把手長度'] = app.get('dimensions', {}).get('length', '')
-            data_mapping['孔距'] = app.get('handleHoleDistance', '')
-        elif main_category == 'S':
-            # Slide特殊欄位
-            data_mapping['滑軌長度'] = app.get('dimensions', {}).get('length', '')
-            data_mapping['滑軌載重'] = app.get('slideLoad', '')
-            data_mapping['滑軌類型'] = app.get('slideType', '')
-            data_mapping['鋼珠大小'] = app.get('ballSize', '')
-        
-        return data_mapping
+        套用計畫時不需建立資料映射字典，也不需逐欄比對欄位名稱。
+        """
+        key = tuple(columns)
+        plan = self._column_plans.get(key)
+        if plan is None:
+            plan = _ColumnPlan(
+                [self._column_getters.get(column_name, _empty_value) for column_name in columns],
+                [self._get_value_converter(column_name) for column_name in columns]
+            )
+            self._column_plans[key] = plan
+        return plan
+    
+    def _get_value_converter(self, column_name: str) -> Optional[Callable[[Any], tuple]]:
+        """依欄位名稱決定特殊格式轉換函式"""
+        if '重量' in column_name or '長度' in column_name or '寬度' in column_name or '高度' in column_name:
+            return self._convert_number
+        elif '日期' in column_name:
+            return self._convert_date
+        return None
+    
+    def _convert_number(self, value: Any) -> tuple:
+        """尺寸與重量轉為數值並套用數字格式，無法轉換時保留原值"""
+        try:
+            if value:
+                return float(value), '#,##0.00'
+        except:
+            pass
+        return value, None
+    
+    def _convert_date(self, value: Any) -> tuple:
+        """ISO日期轉為設定的日期格式，無法轉換時保留原值"""
+        if value:
+            try:
+                date_obj = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                return date_obj.strftime(self.config['date_format']), None
+            except:
+                pass
+        return value, None
     
     def _format_packaging_field(self, field_data: Any) -> str:
         """格式化包裝欄位資料"""
@@ -442,52 +1986,66 @@ class MaterialExcelProcessor:
     def _adjust_column_widths(self, ws, columns: List[str]):
         """自動調整欄寬"""
         for col_idx, column_name in enumerate(columns, 1):
-            col_letter = get_column_letter(col_idx)
-            
-            # 設定基本寬度
-            if '說明' in column_name or '包裝' in column_name:
-                width = 30
-            elif '料號' in column_name or '編號' in column_name:
-                width = 15
-            elif any(keyword in column_name for keyword in ['長', '寬', '高', '重量', 'MOQ']):
-                width = 10
-            else:
-                width = 12
-            
-            ws.column_dimensions[col_letter].width = width
+            col_letter = openpyxl_utils.get_column_letter(col_idx)
+            ws.column_dimensions[col_letter].width = self._column_width(column_name)
+    
+    def _column_width(self, column_name: str) -> int:
+        """依欄位名稱決定基本欄寬"""
+        if '說明' in column_name or '包裝' in column_name:
+            return 30
+        elif '料號' in column_name or '編號' in column_name:
+            return 15
+        elif any(keyword in column_name for keyword in ['長', '寬', '高', '重量', 'MOQ']):
+            return 10
+        else:
+            return 12
     
-    def _add_data_validation(self, ws, max_row: int):
+    def _add_data_validation(self, ws, max_row: int, columns: List[str]):
         """加入資料驗證"""
-        # 單位下拉選單
-        unit_validation = DataValidation(
-            type="list",
-            formula1='"PCS,SET,PAIR,KG,M,BOX"',
-            allow_blank=True
-        )
-        unit_validation.error = '請選擇有效的單位'
-        unit_validation.errorTitle = '單位錯誤'
-        
-        # 找出單位欄位
-        unit_col = None
-        for col_idx, cell in enumerate(ws[1], 1):
-            if cell.value == '單位':
-                unit_col = get_column_letter(col_idx)
-                break
-        
-        if unit_col:
-            unit_validation.add(f'{unit_col}2:{unit_col}{max_row}')
-            ws.add_data_validation(unit_validation)
+        with self._metrics.stage('data_validation'):
+            # 單位下拉選單
+            unit_validation = openpyxl_datavalidation.DataValidation(
+                type="list",
+                formula1=f'"{",".join(UNIT_OPTIONS)}"',
+                allow_blank=True
+            )
+            unit_validation.error = '請選擇有效的單位'
+            unit_validation.errorTitle = '單位錯誤'
+            
+            # 找出單位欄位
+            unit_col = None
+            for col_idx, column_name in enumerate(columns, 1):
+                if column_name == '單位':
+                    unit_col = openpyxl_utils.get_column_letter(col_idx)
+                    break
+            
+            if unit_col:
+                unit_validation.add(f'{unit_col}2:{unit_col}{max_row}')
+                ws.data_validations.append(unit_validation)
     
-    def validate_excel_format(self, file_path: str) -> Dict[str, Any]:
+    def validate_excel_format(self, file_path: str, check_content: bool = False,
+                              max_rows: Optional[int] = None, sample_every: int = 1,
+                              max_errors: Optional[int] = None) -> Dict[str, Any]:
         """
         驗證Excel檔案格式
         
+        以唯讀、values_only 單次走訪各工作表，記憶體用量不隨資料量成長。
+        
         Args:
             file_path: Excel檔案路徑
+            check_content: 是否逐列檢查內容（必要欄位非空、尺寸重量為數值、單位在選項內）
+            max_rows: 每張工作表最多檢查內容的資料列數；設定時筆數改由工作表尺寸資訊取得，
+                沒有尺寸資訊的工作表（如串流寫入產生的檔案）仍需走訪其餘列計數
+            sample_every: 內容檢查的抽樣間隔（每N列檢查一列）
+            max_errors: 錯誤數達到上限時停止驗證
         
         Returns:
             驗證結果字典
+        
+        Raises:
+            ValueError: max_rows / sample_every / max_errors 不是正整數
         """
+        self._check_validation_options(max_rows, sample_every, max_errors)
         results = {
             'valid': True,
             'errors': [],
@@ -496,30 +2054,41 @@ class MaterialExcelProcessor:
             'details': []
         }
         
+        # 各類別的分片編號，用於檢查分片是否連續
+        shard_numbers = {}
+        
         try:
             wb = openpyxl.load_workbook(file_path, read_only=True)
             
             for sheet_name in wb.sheetnames:
                 if sheet_name == 'Summary':
                     continue
+                
+                if max_errors and len(results['errors']) >= max_errors:
+                    break
                     
                 ws = wb[sheet_name]
                 
+                # 分片工作表視為同一類別
+                category_name = self._logical_sheet_name(sheet_name)
+                if category_name != sheet_name:
+                    shard_numbers.setdefault(category_name, []).append(
+                        int(SHARD_SHEET_PATTERN.match(sheet_name).group(2))
+                    )
+                
                 # 檢查欄位
-                expected_columns = self.category_columns.get(sheet_name)
+                expected_columns = self.category_columns.get(category_name)
                 if not expected_columns:
                     results['warnings'].append(f"工作表 {sheet_name} 非標準類別")
                     continue
                 
-                # 取得實際欄位
-                actual_columns = []
-                for cell in ws[1]:
-                    if cell.value:
-                        actual_columns.append(cell.value)
+                # 取得實際欄位（標題列與資料列共用同一次走訪）
+                rows = ws.iter_rows(values_only=True)
+                header = next(rows, ())
+                actual_columns = [value for value in header if value]
                 
                 # 檢查必要欄位
-                required_columns = ['料號', '料件說明', '料件基本材質']
-                missing_required = set(required_columns) - set(actual_columns)
+                missing_required = set(REQUIRED_COLUMNS) - set(actual_columns)
                 if missing_required:
                     results['errors'].append(f"工作表 {sheet_name} 缺少必要欄位: {missing_required}")
                     results['valid'] = False
@@ -529,32 +2098,289 @@ class MaterialExcelProcessor:
                 if missing_columns:
                     results['warnings'].append(f"工作表 {sheet_name} 缺少欄位: {missing_columns}")
                 
-                # 統計資料
+                # 限制讀取列數時，筆數取自工作表尺寸資訊（含空白列）
+                metadata_rows = None
+                scan = rows
+                if max_rows is not None and ws.max_row:
+                    metadata_rows = max(ws.max_row - 1, 0)
+                    if not check_content:
+                        scan = islice(rows, 0)
+                if max_rows is not None:
+                    scan = islice(scan, max_rows)
+                
+                # 統計資料（並可同時檢查內容）
+                checks = self._build_content_checks(header) if check_content else None
                 row_count = 0
-                for row in ws.iter_rows(min_row=2):
-                    if any(cell.value for cell in row):
+                scanned_rows = 0
+                error_limit_reached = False
+                for row_idx, row in enumerate(scan, 2):
+                    scanned_rows += 1
+                    if any(row):
                         row_count += 1
+                        if checks and (row_idx - 2) % sample_every == 0:
+                            for message in self._check_row_content(checks, row):
+                                results['errors'].append(f"工作表 {sheet_name} 第 {row_idx} 列{message}")
+                                results['valid'] = False
+                            if max_errors and len(results['errors']) >= max_errors:
+                                error_limit_reached = True
+                                break
                 
-                results['summary'][sheet_name] = row_count
+                if metadata_rows is not None:
+                    row_count = metadata_rows
+                elif max_rows is not None and not error_limit_reached:
+                    # 串流寫入（write-only）產生的檔案沒有尺寸資訊，其餘列只計數不檢查內容
+                    row_count += sum(1 for row in rows if any(row))
+                
+                results['summary'][category_name] = results['summary'].get(category_name, 0) + row_count
                 results['details'].append({
                     'sheet': sheet_name,
+                    'category': category_name,
                     'rows': row_count,
+                    'scanned_rows': scanned_rows,
                     'columns': len(actual_columns),
                     'missing_columns': list(missing_columns)
                 })
             
             wb.close()
             
+            if max_errors and len(results['errors']) >= max_errors:
+                del results['errors'][max_errors:]
+                results['warnings'].append(f"錯誤數已達上限 {max_errors}，停止驗證")
+            
+            for category_name, numbers in shard_numbers.items():
+                if sorted(numbers) != list(range(1, len(numbers) + 1)):
+                    results['warnings'].append(f"類別 {category_name} 分片不連續: {sorted(numbers)}")
+            
         except Exception as e:
             results['errors'].append(f"檔案讀取錯誤: {str(e)}")
             results['valid'] = False
         
         return results
     
+    def validate_excel_files(self, file_paths: List[str], **options) -> Dict[str, Any]:
+        """
+        驗證多個Excel檔案並彙整為單一報告
+        
+        workers 大於1時各檔案由工作程序平行驗證。
+        
+        Args:
+            file_paths: Excel檔案路徑列表
+            **options: 傳給 validate_excel_format 的驗證選項
+        
+        Returns:
+            彙整後的驗證結果字典，各檔案結果列於 files
+        """
+        self._check_validation_options(
+            options.get('max_rows'), options.get('sample_every', 1), options.get('max_errors')
+        )
+        workers = self.config['workers']
+        if workers > 1 and len(file_paths) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                file_results = list(executor.map(
+                    _validate_file_worker,
+                    [self.config] * len(file_paths),
+                    file_paths,
+                    [options] * len(file_paths)
+                ))
+        else:
+            file_results = [self.validate_excel_format(file_path, **options) for file_path in file_paths]
+        
+        report = {
+            'valid': True,
+            'errors': [],
+            'warnings': [],
+            'summary': {},
+            'files': []
+        }
+        for file_path, results in zip(file_paths, file_results):
+            report['valid'] = report['valid'] and results['valid']
+            report['errors'].extend(f"{file_path}: {error}" for error in results['errors'])
+            report['warnings'].extend(f"{file_path}: {warning}" for warning in results['warnings'])
+            for category_name, row_count in results['summary'].items():
+                report['summary'][category_name] = report['summary'].get(category_name, 0) + row_count
+            report['files'].append(dict(results, file=file_path))
+        
+        return report
+    
+    def _check_validation_options(self, max_rows: Optional[int], sample_every: int,
+                                  max_errors: Optional[int]):
+        """驗證選項必須為正整數（max_rows、max_errors 可為None表示不限制）"""
+        for name, value, optional in (('max_rows', max_rows, True),
+                                      ('sample_every', sample_every, False),
+                                      ('max_errors', max_errors, True)):
+            if value is None and optional:
+                continue
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                raise ValueError(f"{name} 必須為正整數: {value!r}")
+    
+    def _build_content_checks(self, header: tuple) -> List[tuple]:
+        """依標題列建立內容檢查清單 [(欄位索引, 欄位名稱, 檢查類型), ...]"""
+        checks = []
+        for col_idx, column_name in enumerate(header):
+            if column_name in REQUIRED_COLUMNS:
+                checks.append((col_idx, column_name, 'required'))
+            elif column_name == '單位':
+                checks.append((col_idx, column_name, 'unit'))
+            elif column_name in DIMENSION_COLUMNS:
+                checks.append((col_idx, column_name, 'dimension'))
+            elif column_name and self._get_value_converter(column_name) == self._convert_number:
+                checks.append((col_idx, column_name, 'number'))
+        return checks
+    
+    def _check_row_content(self, checks: List[tuple], row: tuple) -> List[str]:
+        """檢查單列資料內容，回傳錯誤訊息列表"""
+        messages = []
+        for col_idx, column_name, check in checks:
+            value = row[col_idx] if col_idx < len(row) else None
+            if check == 'required':
+                if value is None or value == '':
+                    messages.append(f" {column_name} 為必填")
+            elif value is None or value == '':
+                continue
+            elif check == 'unit':
+                if value not in UNIT_OPTIONS:
+                    messages.append(f" {column_name} 無效: {value}")
+            elif check == 'dimension' and _is_number_text(value):
+                continue
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                messages.append(f" {column_name} 應為數值: {value}")
+        return messages
+    
+    def import_excel_to_json(self, file_path: str, output_path: Optional[str] = None) -> str:
+        """
+        將匯出的SAP工作表匯回申請資料（JSON Lines）
+        
+        逐列讀取、逐行寫出，記憶體用量不隨資料量成長。匯出檔不含申請 id，
+        匯回的申請以料號識別；無對應申請欄位的欄（如 料件顏色）不匯入。
+        
+        Args:
+            file_path: Excel檔案路徑
+            output_path: 輸出路徑（可選，預設為同名的 .jsonl）
+        
+        Returns:
+            產生的JSON Lines檔案路徑
+        """
+        if not output_path:
+            output_path = f"{os.path.splitext(file_path)[0]}.jsonl"
+        
+        count = 0
+        temp_path = f"{output_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for app in self.iter_excel_applications(file_path):
+                f.write(json.dumps(app, ensure_ascii=False, default=str))
+                f.write('\n')
+                count += 1
+        os.replace(temp_path, output_path)
+        
+        logger.info(f"✅ 已匯入 {count} 筆申請資料: {output_path}")
+        return output_path
+    
+    def iter_excel_applications(self, file_path: str) -> Iterator[Dict]:
+        """以唯讀、values_only 逐列讀取各類別工作表（含分片），還原為申請資料"""
+        category_codes = {name: code for code, name in self.category_mapping.items()}
+        unmapped = set()
+        
+        wb = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            for sheet_name in wb.sheetnames:
+                if sheet_name == 'Summary':
+                    continue
+                
+                category_name = self._logical_sheet_name(sheet_name)
+                if category_name not in category_codes:
+                    logger.warning(f"略過未知工作表: {sheet_name}")
+                    continue
+                
+                rows = wb[sheet_name].iter_rows(values_only=True)
+                headers = next(rows, ())
+                plan = self._import_plan(headers)
+                unmapped.update(
+                    header for header in headers
+                    if header and header != '產品大類' and header not in IMPORT_FIELDS
+                    and header not in self._packaging_getters
+                )
+                
+                sheet_count = 0
+                for row in rows:
+                    if not any(value not in (None, '') for value in row):
+                        continue
+                    yield self._row_to_application(row, plan, category_codes, category_codes[category_name])
+                    sheet_count += 1
+                logger.info(f"匯入工作表: {sheet_name} ({sheet_count} 筆資料)")
+        finally:
+            wb.close()
+        
+        if unmapped:
+            logger.info(f"無對應申請欄位，未匯入: {', '.join(sorted(unmapped))}")
+    
+    def _import_plan(self, headers: tuple) -> List[tuple]:
+        """
+        依標題列建立各欄的匯入方式
+        
+        Returns:
+            [(欄位索引, 種類, 對象), ...]；種類為 field（對象為申請資料路徑）、
+            packaging（對象為包裝鍵值）或 category
+        """
+        plan = []
+        for col_idx, header in enumerate(headers):
+            if header == '產品大類':
+                plan.append((col_idx, 'category', None))
+            elif header in IMPORT_FIELDS:
+                plan.append((col_idx, 'field', IMPORT_FIELDS[header]))
+            elif header in self._packaging_getters:
+                # Other 欄位對應前端的 其他說明
+                plan.append((col_idx, 'packaging', '其他說明' if header == 'Other' else header))
+        return plan
+    
+    def _row_to_application(self, row: tuple, plan: List[tuple], category_codes: Dict[str, str],
+                            default_category: str) -> Dict:
+        """將一列資料還原為申請資料（空白儲存格不產生欄位）"""
+        app = {'mainCategory': default_category}
+        packaging = {}
+        
+        for col_idx, kind, target in plan:
+            value = row[col_idx] if col_idx < len(row) else None
+            if value is None or value == '':
+                continue
+            
+            if kind == 'field':
+                if isinstance(value, datetime):
+                    value = value.strftime(self.config['date_format'])
+                elif isinstance(value, float) and value.is_integer():
+                    # 尺寸與重量以浮點數寫出，整數值還原為整數
+                    value = int(value)
+                container = app
+                for key in target[:-1]:
+                    container = container.setdefault(key, {})
+                container.setdefault(target[-1], value)
+            elif kind == 'packaging':
+                packaging[target] = self._parse_packaging_field(value)
+            else:
+                app['mainCategory'] = category_codes.get(value, default_category)
+        
+        if packaging:
+            app['packaging'] = packaging
+        return app
+    
+    def _parse_packaging_field(self, value: Any) -> Dict[str, Any]:
+        """解析 _format_packaging_field 的格式化結果（_format_packaging_field 的反向）"""
+        text = str(value)
+        match = PACKAGING_FIELD_PATTERN.match(text)
+        if not match:
+            return {'options': [], 'description': text}
+        
+        options = [option for option in match.group(1).split(', ') if option]
+        return {'options': options, 'description': match.group(2) or ''}
+    
     def merge_excel_files(self, file_paths: List[str], output_path: str) -> str:
         """
         合併多個Excel檔案
         
+        各輸入檔依序開啟，讀取標題列並將資料列逐列暫存至磁碟後即關閉，
+        同一時間只有一個輸入檔（及其共用字串表）在記憶體中；再依各類別的
+        欄位聯集從暫存檔串流寫入write-only工作簿。workers 大於1時各輸入檔
+        由工作程序平行解析，再由主程序依序寫入。
+        
         Args:
             file_paths: Excel檔案路徑列表
             output_path: 輸出檔案路徑
@@ -564,65 +2390,1151 @@ class MaterialExcelProcessor:
         """
         logger.info(f"開始合併 {len(file_paths)} 個檔案")
         
-        merged_data = {}
+        merged_headers = {}
+        merged_sources = {}
+        
+        with tempfile.TemporaryDirectory(prefix='material_merge_') as spool_dir:
+            # 第一階段：暫存各輸入檔的資料列，依出現順序取得各類別的欄位聯集
+            for file_path, sheets in self._iter_spooled_inputs(file_paths, spool_dir):
+                for category_name, sheet_headers, spool_path in sheets:
+                    headers = merged_headers.setdefault(category_name, [])
+                    for header in sheet_headers:
+                        if header and header not in headers:
+                            headers.append(header)
+                    merged_sources.setdefault(category_name, []).append(
+                        (sheet_headers, _iter_pickled_rows(spool_path))
+                    )
+                logger.info(f"成功讀取: {file_path}")
+            
+            # 第二階段：從暫存檔逐列寫入write-only工作簿
+            self._write_merged_workbook(merged_headers, merged_sources, output_path)
         
-        for file_path in file_paths:
-            try:
-                wb = openpyxl.load_workbook(file_path, read_only=True)
+        logger.info(f"✅ 合併完成: {output_path}")
+        
+        return output_path
+    
+    def _iter_spooled_inputs(self, file_paths: List[str], spool_dir: str) -> Iterator[tuple]:
+        """
+        依輸入檔順序暫存各檔的資料列（workers 大於1時以多程序平行解析）
+        
+        讀取失敗的檔案記錄錯誤後略過。
+        
+        Yields:
+            (檔案路徑, _spool_workbook_rows 的結果)
+        """
+        workers = self.config['workers']
+        if workers <= 1:
+            for file_path in file_paths:
+                try:
+                    sheets = self._spool_workbook_rows(file_path, spool_dir)
+                except Exception as e:
+                    logger.error(f"讀取檔案失敗 {file_path}: {e}")
+                    continue
+                yield file_path, sheets
+            return
+        
+        logger.info(f"以 {workers} 個工作程序解析輸入檔")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_spool_workbook_rows_worker, self.config, file_path, spool_dir)
+                for file_path in file_paths
+            ]
+            # 依輸入檔順序收集，確保合併結果與單程序相同
+            for file_path, future in zip(file_paths, futures):
+                try:
+                    sheets = future.result()
+                except Exception as e:
+                    logger.error(f"讀取檔案失敗 {file_path}: {e}")
+                    continue
+                yield file_path, sheets
+    
+    def _spool_workbook_rows(self, file_path: str, spool_dir: str) -> List[tuple]:
+        """
+        讀取單一Excel檔案，各工作表的資料列以pickle逐列暫存至磁碟
+        
+        Returns:
+            [(類別名稱, 標題列, 暫存檔路徑), ...]
+        """
+        sheets = []
+        wb = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            for sheet_name in wb.sheetnames:
+                if sheet_name == 'Summary':
+                    continue
                 
-                for sheet_name in wb.sheetnames:
-                    if sheet_name == 'Summary':
-                        continue
-                    
-                    if sheet_name not in merged_data:
-                        merged_data[sheet_name] = []
-                    
-                    ws = wb[sheet_name]
-                    
-                    # 讀取標題
-                    headers = []
-                    for cell in ws[1]:
-                        if cell.value:
-                            headers.append(cell.value)
-                    
-                    # 讀取資料
-                    for row in ws.iter_rows(min_row=2, values_only=True):
+                rows = wb[sheet_name].iter_rows(values_only=True)
+                sheet_headers = next(rows, ())
+                fd, spool_path = tempfile.mkstemp(suffix='.pkl', dir=spool_dir)
+                with os.fdopen(fd, 'wb') as f:
+                    pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+                    for row in rows:
                         if any(row):
-                            row_dict = dict(zip(headers, row))
-                            merged_data[sheet_name].append(row_dict)
+                            pickler.dump(row)
+                sheets.append((self._logical_sheet_name(sheet_name), sheet_headers, spool_path))
+        finally:
+            wb.close()
+        return sheets
+    
+    def _write_merged_workbook(self, merged_headers: Dict[str, List[str]],
+                               merged_sources: Dict[str, List[tuple]], output_path: str):
+        """將各類別的來源資料列寫入write-only工作簿（超過每張工作表上限時重新分片）"""
+        output_wb = openpyxl.Workbook(write_only=True)
+        self._register_styles(output_wb)
+        
+        for category_name, sources in merged_sources.items():
+            row_count = self._merge_category_rows(
+                output_wb, category_name, merged_headers[category_name], sources
+            )
+            logger.info(f"合併類別 {category_name}: {row_count} 筆資料")
+        
+        # 儲存檔案
+        output_wb.save(output_path)
+    
+    def _merge_category_rows(self, wb, category_name: str, headers: List[str],
+                             sources: List[tuple]) -> int:
+        """
+        將同一類別各來源工作表的資料列依欄位聯集寫入
+        
+        筆數超過 max_rows_per_sheet 時，第一張工作表更名為 Handle_001
+        並接續寫入 Handle_002 ...，命名與 _plan_shards 相同。
+        
+        Returns:
+            寫入的資料筆數
+        """
+        max_rows = self.config['max_rows_per_sheet']
+        header_index = {header: col_idx for col_idx, header in enumerate(headers)}
+        
+        ws = None
+        shard_idx = 0
+        sheet_rows = 0
+        row_count = 0
+        
+        for sheet_headers, rows in sources:
+            # 來源欄位位置 -> 合併後欄位位置
+            positions = [
+                (col_idx, header_index[header])
+                for col_idx, header in enumerate(sheet_headers) if header
+            ]
+            
+            for row in rows:
+                if not any(row):
+                    continue
                 
-                wb.close()
-                logger.info(f"成功讀取: {file_path}")
+                if ws is None or (max_rows and sheet_rows >= max_rows):
+                    shard_idx += 1
+                    if shard_idx == 2:
+                        ws.title = f"{category_name}_001"
+                    ws = wb.create_sheet(
+                        category_name if shard_idx == 1 else f"{category_name}_{shard_idx:03d}"
+                    )
+                    ws.append([self._header_cell(ws, header) for header in headers])
+                    sheet_rows = 0
                 
-            except Exception as e:
-                logger.error(f"讀取檔案失敗 {file_path}: {e}")
+                values = [''] * len(headers)
+                for col_idx, merged_idx in positions:
+                    if col_idx < len(row):
+                        values[merged_idx] = row[col_idx]
+                ws.append(values)
+                sheet_rows += 1
+                row_count += 1
+        
+        return row_count
+    
+    def _header_cell(self, ws, value: str) -> 'openpyxl_cell.WriteOnlyCell':
+        """建立套用標題樣式的write-only儲存格"""
+        cell = openpyxl_cell.WriteOnlyCell(ws, value=value)
+        cell.style = 'header'
+        return cell
+    
+    def diff_excel_files(self, old_path: str, new_path: str,
+                         output_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        比對兩個匯出檔，列出新增、刪除與變更的料號（含變更欄位）
+        
+        第一次走訪只建立 料號 → 內容雜湊 的索引（欄位依名稱比對，欄位順序
+        不同或分片不同不影響結果）；只有變更的料號會在第二次走訪時讀回
+        完整資料，且只讀取含變更料號的工作表，找齊即停止。舊檔的變更列
+        暫存於磁碟上的SQLite，新檔的變更列逐筆比對後直接寫入報告，記憶體
+        用量不隨變更筆數成長。workers 大於1時兩個檔案的索引以兩個程序平行建立。
+        
+        Args:
+            old_path: 舊匯出檔
+            new_path: 新匯出檔
+            output_path: 差異報告路徑（可選，.json 為JSON，其餘為Excel）；變更前後的值只寫入報告檔
+        
+        Returns:
+            差異報告（統計、新增 / 刪除的料號，以及各變更料號的變更欄位名稱）
+        """
+        if self.config['workers'] > 1:
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                old_future = executor.submit(_diff_index_worker, self.config, old_path)
+                new_future = executor.submit(_diff_index_worker, self.config, new_path)
+                old_index, old_sheets = old_future.result()
+                new_index, new_sheets = new_future.result()
+        else:
+            old_index, old_sheets = self._build_diff_index(old_path)
+            new_index, new_sheets = self._build_diff_index(new_path)
+        logger.info(f"索引完成: 舊檔 {len(old_index)} 筆, 新檔 {len(new_index)} 筆")
+        
+        # 索引值的低8位元為工作表編號，其餘為內容雜湊
+        added = [(key, new_sheets[value & 0xFF]) for key, value in new_index.items() if key not in old_index]
+        removed = [(key, old_sheets[value & 0xFF]) for key, value in old_index.items() if key not in new_index]
+        changed_keys = {
+            key for key, value in new_index.items()
+            if key in old_index and old_index[key] >> 8 != value >> 8
+        }
+        
+        report = {
+            'old_file': old_path,
+            'new_file': new_path,
+            'summary': {
+                'old_rows': len(old_index),
+                'new_rows': len(new_index),
+                'added': len(added),
+                'removed': len(removed),
+                'changed': len(changed_keys),
+                'unchanged': len(new_index) - len(added) - len(changed_keys)
+            },
+            'added': [{'key': key, 'sheet': sheet} for key, sheet in added],
+            'removed': [{'key': key, 'sheet': sheet} for key, sheet in removed],
+            'changed': []
+        }
         
-        # 建立新的工作簿
-        wb = openpyxl.Workbook()
-        wb.remove(wb.active)
+        writer = None
+        if output_path:
+            writer_class = _DiffJsonWriter if output_path.lower().endswith('.json') else _DiffWorkbookWriter
+            writer = writer_class(self, report, output_path)
+        try:
+            if changed_keys:
+                for change in self._iter_changes(old_path, new_path, changed_keys,
+                                                 (old_index, old_sheets), (new_index, new_sheets)):
+                    if writer is not None:
+                        writer.write_change(change)
+                    report['changed'].append({
+                        'key': change['key'],
+                        'sheet': change['sheet'],
+                        'columns': [column['column'] for column in change['columns']]
+                    })
+            if writer is not None:
+                writer.save()
+        finally:
+            if writer is not None:
+                writer.close()
+        
+        if output_path:
+            logger.info(f"✅ 差異報告已產生: {output_path}")
+        return report
+    
+    def _iter_changes(self, old_path: str, new_path: str, keys: set,
+                      old_lookup: tuple, new_lookup: tuple) -> Iterator[Dict[str, Any]]:
+        """
+        逐筆產生變更料號的欄位差異（依新檔的工作表與列順序）
         
-        # 寫入合併的資料
-        for sheet_name, data in merged_data.items():
-            if data:
-                ws = wb.create_sheet(sheet_name)
+        舊檔的變更列先寫入暫存SQLite，再串流讀取新檔的變更列逐筆查詢比對，
+        兩邊都不需要把變更列保留在記憶體中。
+        """
+        with tempfile.TemporaryDirectory(prefix='material_diff_') as tmp_dir:
+            conn = sqlite3.connect(os.path.join(tmp_dir, 'old_rows.sqlite'))
+            try:
+                conn.execute('CREATE TABLE rows (key TEXT PRIMARY KEY, row BLOB NOT NULL)')
+                conn.executemany('INSERT INTO rows VALUES (?, ?)', (
+                    (key, pickle.dumps(row, pickle.HIGHEST_PROTOCOL))
+                    for key, sheet_name, row in self._iter_diff_rows(old_path, keys, *old_lookup)
+                ))
                 
-                # 寫入標題
-                headers = list(data[0].keys())
-                for col_idx, header in enumerate(headers, 1):
-                    cell = ws.cell(row=1, column=col_idx, value=header)
-                    cell.style = 'header'
+                for key, sheet_name, new_row in self._iter_diff_rows(new_path, keys, *new_lookup):
+                    old_row = pickle.loads(conn.execute('SELECT row FROM rows WHERE key = ?', (key,)).fetchone()[0])
+                    yield {
+                        'key': key,
+                        'sheet': sheet_name,
+                        'columns': [
+                            {'column': column, 'old': old_row.get(column), 'new': new_row.get(column)}
+                            for column in list(old_row) + [column for column in new_row if column not in old_row]
+                            if _diff_value(old_row.get(column)) != _diff_value(new_row.get(column))
+                        ]
+                    }
+            finally:
+                conn.close()
+    
+    def _iter_diff_sheets(self, file_path: str, sheet_names: Optional[set] = None) -> Iterator[tuple]:
+        """
+        逐張讀取類別工作表（唯讀、values_only）
+        
+        Yields:
+            (工作表名稱, 標題列, 料號欄位索引, 資料列迭代器)；沒有 料號 欄的工作表略過
+        """
+        wb = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            for sheet_name in wb.sheetnames:
+                if sheet_name == 'Summary' or (sheet_names is not None and sheet_name not in sheet_names):
+                    continue
+                rows = wb[sheet_name].iter_rows(values_only=True)
+                headers = next(rows, ())
+                if '料號' not in headers:
+                    logger.warning(f"略過沒有料號欄位的工作表: {sheet_name}")
+                    continue
+                yield sheet_name, headers, headers.index('料號'), rows
+        finally:
+            wb.close()
+    
+    def _build_diff_index(self, file_path: str) -> tuple:
+        """
+        建立 料號 → 內容雜湊 索引
+        
+        雜湊涵蓋依欄位名稱排序的各欄非空白值（與欄位順序無關）；
+        索引值為 (64位元雜湊 << 8) | 工作表編號，只保留整數以節省記憶體。
+        
+        Returns:
+            (索引, 工作表名稱列表)
+        """
+        index = {}
+        sheets = []
+        duplicates = 0
+        blake2b = hashlib.blake2b
+        
+        for sheet_name, headers, key_idx, rows in self._iter_diff_sheets(file_path):
+            if len(sheets) > 0xFF:
+                raise ValueError(f"工作表數量超過 256 張，無法比對: {file_path}")
+            sheet_id = len(sheets)
+            sheets.append(sheet_name)
+            # 依欄位名稱排序的欄位索引（欄位名稱一併納入雜湊）
+            order = sorted((str(header), col_idx) for col_idx, header in enumerate(headers) if header)
+            
+            for row in rows:
+                key = row[key_idx] if key_idx < len(row) else None
+                if key is None or key == '':
+                    continue
+                key = str(key)
+                digest = blake2b(digest_size=8)
+                for header, col_idx in order:
+                    value = _diff_value(row[col_idx]) if col_idx < len(row) else None
+                    if value is not None:
+                        digest.update(f"{header}\x1f{value}\x1e".encode('utf-8'))
                 
-                # 寫入資料
-                for row_idx, row_data in enumerate(data, 2):
-                    for col_idx, header in enumerate(headers, 1):
-                        value = row_data.get(header, '')
-                        ws.cell(row=row_idx, column=col_idx, value=value)
+                if key in index:
+                    # 重複料號以第一筆為準
+                    duplicates += 1
+                    continue
+                index[key] = int.from_bytes(digest.digest(), 'big') << 8 | sheet_id
         
-        # 儲存檔案
-        wb.save(output_path)
-        logger.info(f"✅ 合併完成: {output_path}")
+        if duplicates:
+            logger.warning(f"{file_path} 有 {duplicates} 筆重複料號，以第一筆為準")
+        return index, sheets
+    
+    def _iter_diff_rows(self, file_path: str, keys: set, index: Dict[str, int],
+                        sheets: List[str]) -> Iterator[tuple]:
+        """
+        只讀取含指定料號的工作表，逐筆產生各料號的完整資料
         
-        return output_path
+        Yields:
+            (料號, 工作表名稱, 欄位名稱 → 值)
+        """
+        remaining = {}
+        for key in keys:
+            remaining.setdefault(sheets[index[key] & 0xFF], set()).add(key)
+        
+        for sheet_name, headers, key_idx, rows in self._iter_diff_sheets(file_path, set(remaining)):
+            wanted = remaining[sheet_name]
+            for row in rows:
+                key = row[key_idx] if key_idx < len(row) else None
+                if key is None or str(key) not in wanted:
+                    continue
+                key = str(key)
+                wanted.discard(key)
+                yield key, sheet_name, {header: value for header, value in zip(headers, row) if header}
+                # 找齊此工作表的變更料號即停止
+                if not wanted:
+                    break
+
+
+class _DiffWorkbookWriter:
+    """
+    以write-only工作簿寫出差異報告（差異摘要、新增、刪除、變更）
+    
+    建立時先寫入摘要、新增與刪除工作表，變更工作表最後建立並逐筆寫入。
+    """
+    
+    def __init__(self, processor: MaterialExcelProcessor, report: Dict[str, Any], output_path: str):
+        self.output_path = output_path
+        self.wb = openpyxl.Workbook(write_only=True)
+        processor._register_styles(self.wb)
+        header_cell = processor._header_cell
+        
+        ws = self.wb.create_sheet('差異摘要')
+        ws.column_dimensions['A'].width = 20
+        ws.column_dimensions['B'].width = 40
+        ws.append([header_cell(ws, '項目'), header_cell(ws, '值')])
+        ws.append(['舊檔', report['old_file']])
+        ws.append(['新檔', report['new_file']])
+        labels = {'old_rows': '舊檔筆數', 'new_rows': '新檔筆數', 'added': '新增',
+                  'removed': '刪除', 'changed': '變更', 'unchanged': '未變更'}
+        for name, count in report['summary'].items():
+            ws.append([labels[name], count])
+        
+        for title, items in [('新增', report['added']), ('刪除', report['removed'])]:
+            ws = self.wb.create_sheet(title)
+            ws.column_dimensions['A'].width = 20
+            ws.column_dimensions['B'].width = 25
+            ws.append([header_cell(ws, '料號'), header_cell(ws, '工作表')])
+            for item in items:
+                ws.append([item['key'], item['sheet']])
+        
+        # 變更：每個變更欄位一列
+        self.changes = self.wb.create_sheet('變更')
+        for col, width in zip('ABCDE', [20, 25, 20, 40, 40]):
+            self.changes.column_dimensions[col].width = width
+        self.changes.append([header_cell(self.changes, header) for header in ['料號', '工作表', '欄位', '舊值', '新值']])
+    
+    def write_change(self, change: Dict[str, Any]):
+        for column in change['columns']:
+            self.changes.append([change['key'], change['sheet'], column['column'], column['old'], column['new']])
+    
+    def save(self):
+        self.wb.save(self.output_path)
+    
+    def close(self):
+        pass
+
+
+class _DiffJsonWriter:
+    """以JSON寫出差異報告，變更逐筆寫入檔案（每筆一行）"""
+    
+    def __init__(self, processor: MaterialExcelProcessor, report: Dict[str, Any], output_path: str):
+        self.f = open(output_path, 'w', encoding='utf-8')
+        self.f.write('{\n')
+        for name in ['old_file', 'new_file', 'summary', 'added', 'removed']:
+            self.f.write(f'  "{name}": {json.dumps(report[name], ensure_ascii=False, default=str)},\n')
+        self.f.write('  "changed": [')
+        self.count = 0
+    
+    def write_change(self, change: Dict[str, Any]):
+        self.f.write(',\n    ' if self.count else '\n    ')
+        self.f.write(json.dumps(change, ensure_ascii=False, default=str))
+        self.count += 1
+    
+    def save(self):
+        self.f.write('\n  ]\n}\n' if self.count else ']\n}\n')
+    
+    def close(self):
+        self.f.close()
+
+
+class _OpenpyxlWorkbookWriter:
+    """以openpyxl寫出工作簿（依 write_only 設定使用一般或串流工作表）"""
+    
+    def __init__(self, processor: MaterialExcelProcessor, output_path: str):
+        self.processor = processor
+        self.output_path = output_path
+        self.wb = processor._new_workbook()
+        self.styles = None
+    
+    def write_summary(self, categorized: Dict, total_count: int, shard_plans: Optional[Dict] = None):
+        self.processor._create_summary_sheet(self.wb, categorized, total_count, shard_plans)
+    
+    def write_category(self, sheet_title: str, sheet_name: str, applications: Iterable[Dict]):
+        ws = self.wb.create_sheet(sheet_title)
+        # 樣式在第一張類別工作表解析一次，之後各工作表共用
+        if self.styles is None:
+            self.styles = _CellStyles(ws)
+        self.processor._write_category_sheet(ws, sheet_name, applications, self.styles)
+    
+    def save(self):
+        self.wb.save(self.output_path)
+
+
+class _XlsxWriterWorkbookWriter:
+    """
+    以xlsxwriter的constant_memory模式寫出工作簿
+    
+    樣式由處理器的具名樣式轉換而來，凍結窗格、自動篩選、欄寬與
+    單位下拉選單與openpyxl輸出相同。
+    """
+    
+    def __init__(self, processor: MaterialExcelProcessor, output_path: str):
+        if not xlsxwriter.available:
+            raise ImportError('使用xlsxwriter寫入引擎需安裝xlsxwriter套件')
+        self.processor = processor
+        self.wb = xlsxwriter.Workbook(output_path, {
+            'constant_memory': True,
+            # 與openpyxl相同：字串不自動轉為超連結，NaN/INF不中斷寫入
+            'strings_to_urls': False,
+            'nan_inf_to_errors': True
+        })
+        self.header_format = self.wb.add_format(_xlsxwriter_format_options(processor.header_style))
+        self.data_options = _xlsxwriter_format_options(processor.data_style)
+        self.data_formats = {None: self.wb.add_format(self.data_options)}
+        self.title_format = self.wb.add_format({
+            'bold': True, 'font_size': 16, 'font_color': '#366092', 'align': 'center', 'valign': 'vcenter'
+        })
+        self.section_format = self.wb.add_format({'bold': True, 'font_size': 12})
+    
+    def write_summary(self, categorized: Dict, total_count: int, shard_plans: Optional[Dict] = None):
+        ws = self.wb.add_worksheet('Summary')
+        ws.set_column(0, 2, 20)
+        for row_idx, (kind, values) in enumerate(
+            self.processor._build_summary_rows(categorized, total_count, shard_plans)
+        ):
+            if kind == 'title':
+                ws.merge_range(row_idx, 0, row_idx, 5, values[0], self.title_format)
+                continue
+            cell_format = {'section': self.section_format, 'header': self.header_format}.get(kind)
+            for col_idx, value in enumerate(values):
+                ws.write(row_idx, col_idx, value, cell_format)
+    
+    def write_category(self, sheet_title: str, sheet_name: str, applications: Iterable[Dict]):
+        processor = self.processor
+        config = processor.config
+        columns = processor.category_columns.get(sheet_name, processor.category_columns['Others'])
+        ws = self.wb.add_worksheet(sheet_title)
+        
+        for col_idx, column_name in enumerate(columns):
+            ws.set_column(col_idx, col_idx, processor._column_width(column_name))
+        if config['freeze_panes']:
+            ws.freeze_panes(config['freeze_panes'])
+        
+        ws.write_row(0, 0, columns, self.header_format)
+        
+        # constant_memory模式須逐列依序寫入
+        last_row = 0
+        data_formats = self.data_formats
+        for last_row, (values, number_formats) in enumerate(processor._extract_rows(columns, applications), 1):
+            for col_idx, (value, number_format) in enumerate(zip(values, number_formats)):
+                cell_format = data_formats.get(number_format)
+                if cell_format is None:
+                    cell_format = data_formats[number_format] = self.wb.add_format(
+                        dict(self.data_options, num_format=number_format)
+                    )
+                ws.write(last_row, col_idx, value, cell_format)
+        
+        if config['auto_filter']:
+            ws.autofilter(0, 0, last_row, len(columns) - 1)
+        
+        if config['include_validation'] and '單位' in columns:
+            unit_col = columns.index('單位')
+            ws.data_validation(1, unit_col, max(last_row, 1), unit_col, {
+                'validate': 'list',
+                'source': UNIT_OPTIONS,
+                'ignore_blank': True,
+                'error_title': '單位錯誤',
+                'error_message': '請選擇有效的單位'
+            })
+    
+    def save(self):
+        self.wb.close()
+
+
+class _DelimitedFileWriter:
+    """
+    以CSV / TSV寫出單一類別檔案
+    
+    欄位順序與數值格式與Excel工作表相同，逐列寫入磁碟；
+    編碼使用設定的 encoding（預設 utf-8-sig，方便Excel與SAP讀取）。
+    """
+    
+    def __init__(self, processor: MaterialExcelProcessor, output_path: str, delimiter: str):
+        self.processor = processor
+        self.output_path = output_path
+        self.file = open(output_path, 'w', newline='', encoding=processor.config['encoding'])
+        self.writer = csv.writer(self.file, delimiter=delimiter)
+    
+    def write_summary(self, categorized: Dict, total_count: int, shard_plans: Optional[Dict] = None):
+        for _, values in self.processor._build_summary_rows(categorized, total_count, shard_plans):
+            self.writer.writerow(values)
+    
+    def write_category(self, sheet_title: str, sheet_name: str, applications: Iterable[Dict]):
+        processor = self.processor
+        columns = processor.category_columns.get(sheet_name, processor.category_columns['Others'])
+        self.writer.writerow(columns)
+        self.writer.writerows(values for values, _ in processor._extract_rows(columns, applications))
+    
+    def save(self):
+        self.file.close()
+
+
+class _ParquetFileWriter:
+    """
+    以Parquet寫出單一類別檔案
+    
+    尺寸與重量欄位存為 float64（空值或無法轉換的值存為 null），
+    其餘欄位存為字串；資料分批寫入 row group，不保留整個類別於記憶體。
+    """
+    
+    def __init__(self, processor: MaterialExcelProcessor, output_path: str, batch_size: int = 50000):
+        if not pa.available:
+            raise ImportError('輸出Parquet格式需安裝pyarrow套件')
+        self.processor = processor
+        self.output_path = output_path
+        self.batch_size = batch_size
+    
+    def write_summary(self, categorized: Dict, total_count: int, shard_plans: Optional[Dict] = None):
+        # Parquet為表格格式，只輸出類別統計
+        categories = [
+            values for kind, values in self.processor._build_summary_rows(categorized, total_count)
+            if kind == 'category'
+        ]
+        table = pa.table({
+            '類別': pa.array([values[0] for values in categories], pa.string()),
+            '數量': pa.array([values[1] for values in categories], pa.int64()),
+            '百分比': pa.array([values[2] for values in categories], pa.string())
+        })
+        pq.write_table(table, self.output_path)
+    
+    def write_category(self, sheet_title: str, sheet_name: str, applications: Iterable[Dict]):
+        processor = self.processor
+        columns = processor.category_columns.get(sheet_name, processor.category_columns['Others'])
+        numeric = [processor._get_value_converter(column_name) == processor._convert_number
+                   for column_name in columns]
+        schema = pa.schema([
+            (column_name, pa.float64() if is_numeric else pa.string())
+            for column_name, is_numeric in zip(columns, numeric)
+        ])
+        
+        with pq.ParquetWriter(self.output_path, schema) as writer:
+            rows = processor._extract_rows(columns, applications)
+            while True:
+                batch = [values for values, _ in islice(rows, self.batch_size)]
+                arrays = []
+                for col_idx, is_numeric in enumerate(numeric):
+                    if is_numeric:
+                        column = [value if isinstance(value, float) else None
+                                  for value in (values[col_idx] for values in batch)]
+                    else:
+                        column = [value if value is None or isinstance(value, str) else str(value)
+                                  for value in (values[col_idx] for values in batch)]
+                    arrays.append(pa.array(column, schema.field(col_idx).type))
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                if len(batch) < self.batch_size:
+                    break
+    
+    def save(self):
+        pass
+
+
+def _xlsxwriter_format_options(named_style: 'openpyxl_styles.NamedStyle') -> Dict[str, Any]:
+    """將openpyxl具名樣式轉換為xlsxwriter格式設定"""
+    border_styles = {'thin': 1, 'medium': 2, 'dashed': 3, 'dotted': 4, 'thick': 5, 'double': 6}
+    font = named_style.font
+    options = {'font_size': font.sz, 'bold': bool(font.b)}
+    if font.color is not None and font.color.rgb:
+        options['font_color'] = '#' + font.color.rgb[-6:]
+    
+    fill = named_style.fill
+    if fill.fill_type == 'solid':
+        options['pattern'] = 1
+        options['bg_color'] = '#' + fill.fgColor.rgb[-6:]
+    
+    alignment = named_style.alignment
+    if alignment.horizontal:
+        options['align'] = alignment.horizontal
+    if alignment.vertical:
+        options['valign'] = 'vcenter' if alignment.vertical == 'center' else alignment.vertical
+    if alignment.wrap_text:
+        options['text_wrap'] = True
+    
+    for side in ['left', 'right', 'top', 'bottom']:
+        border = getattr(named_style.border, side)
+        if border is not None and border.style:
+            options[side] = border_styles.get(border.style, 1)
+    return options
+
+
+def _write_sheet_file_worker(config: Dict, sheet_name: str, shard_name: str,
+                             applications: List[Dict], output_path: str) -> str:
+    """工作程序進入點：以相同配置建立處理器並寫出單一分片檔案"""
+    processor = MaterialExcelProcessor(config=config)
+    return processor._write_sheet_file(sheet_name, shard_name, applications, output_path)
+
+
+def _validate_file_worker(config: Dict, file_path: str, options: Dict) -> Dict[str, Any]:
+    """工作程序進入點：驗證單一Excel檔案"""
+    processor = MaterialExcelProcessor(config=config)
+    return processor.validate_excel_format(file_path, **options)
+
+
+def _spool_workbook_rows_worker(config: Dict, file_path: str, spool_dir: str) -> List[tuple]:
+    """工作程序進入點：解析單一Excel檔案並將資料列暫存至磁碟"""
+    processor = MaterialExcelProcessor(config=config)
+    return processor._spool_workbook_rows(file_path, spool_dir)
+
+
+def _diff_index_worker(config: Dict, file_path: str) -> tuple:
+    """工作程序進入點：建立單一匯出檔的 料號 → 內容雜湊 索引"""
+    processor = MaterialExcelProcessor(config=config)
+    return processor._build_diff_index(file_path)
+
+
+def _iter_pickled_rows(spool_path: str) -> Iterator[tuple]:
+    """逐列讀回 _spool_workbook_rows 暫存的資料列"""
+    with open(spool_path, 'rb') as f:
+        unpickler = pickle.Unpickler(f)
+        while True:
+            try:
+                yield unpickler.load()
+            except EOFError:
+                return
+
+
+def _print_profile(profiler, output_path: Optional[str] = None, limit: int = 25):
+    """輸出 cProfile 累計耗時排行與 tracemalloc 尖峰配置量"""
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print("\n" + "="*60)
+    print(f"效能剖析（依累計耗時前 {limit} 名）")
+    print("="*60)
+    stats = pstats.Stats(profiler, stream=sys.stdout)
+    stats.sort_stats('cumulative').print_stats(limit)
+    print(f"🧠 Python配置尖峰: {peak / (1024 * 1024):.1f} MB（結束時 {current / (1024 * 1024):.1f} MB）")
+    
+    if output_path:
+        stats.dump_stats(output_path)
+        print(f"📄 剖析資料已寫入: {output_path}（可用 python -m pstats 或 snakeviz 檢視）")
+
+
+def _expand_file_patterns(patterns: List[str]) -> List[str]:
+    """展開檔案路徑中的萬用字元（如 exports/*.xlsx），保留輸入順序並去除重複"""
+    file_paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for file_path in matches:
+            if file_path not in file_paths:
+                file_paths.append(file_path)
+    return file_paths
+
+
+# 工作程序內以配置為鍵保留處理器，讓擷取計畫等快取在各工作之間延續（超過上限時淘汰最早建立者）
+_SERVICE_PROCESSORS = {}
+_SERVICE_PROCESSOR_LIMIT = 8
+
+
+def _run_service_job(config: Dict, action: str, params: Dict, output_path: str) -> Any:
+    """工作程序進入點：執行匯出服務的單一工作（輸入路徑已由服務解析並限制在輸入根目錄內）"""
+    config_key = json.dumps(config, sort_keys=True, default=str)
+    processor = _SERVICE_PROCESSORS.get(config_key)
+    if processor is None:
+        if len(_SERVICE_PROCESSORS) >= _SERVICE_PROCESSOR_LIMIT:
+            del _SERVICE_PROCESSORS[next(iter(_SERVICE_PROCESSORS))]
+        processor = _SERVICE_PROCESSORS[config_key] = MaterialExcelProcessor(config=config)
+    
+    if action == 'convert':
+        json_data = params['data'] if 'data' in params else params['input']
+        return processor.process_json_to_excel(json_data, output_path)
+    if action == 'merge':
+        return processor.merge_excel_files(params['files'], output_path)
+    return processor.validate_excel_files(params['files'], **params.get('options', {}))
+
+
+class MaterialExportService:
+    """
+    常駐匯出服務：以asyncio佇列接收 convert / validate / merge 工作，
+    在固定大小的程序池中執行，並提供工作狀態查詢與下載端點
+    
+    HTTP端點：
+        POST /jobs                 建立工作 {"action": ..., "input"/"data"/"files": ..., "config": {...}}
+        GET  /jobs                 列出所有工作
+        GET  /jobs/<id>            查詢工作狀態與結果
+        GET  /jobs/<id>/download   下載 convert / merge 產生的檔案（檔案組合以zip下載）
+        GET  /health               服務狀態
+    
+    除 /health 外都需以 Authorization: Bearer <token> 驗證；POST 只接受
+    application/json，本文大小以 max_body_bytes 為上限。input / files 為
+    相對於 input_root 的路徑（可含萬用字元），不能存取根目錄以外的檔案；
+    未設定 input_root 時只接受以 data 內嵌的申請資料。config 只能覆寫
+    CONFIG_KEYS 中影響輸出內容的項目。已結束的工作超過 job_ttl 秒或
+    總數超過 max_jobs 時，連同輸出檔一併清除。
+    """
+    
+    ACTIONS = ['convert', 'validate', 'merge']
+    DEFAULT_OUTPUT_NAMES = {'convert': 'SAP_Material_Import.xlsx', 'merge': 'Merged.xlsx'}
+    
+    # 單次工作可覆寫的配置（只限輸出格式與內容；路徑類設定如 manifest_path、cache_dir、
+    # metrics_path 與程序數等只能由服務端配置決定）
+    CONFIG_KEYS = [
+        'encoding', 'date_format', 'decimal_places', 'max_rows_per_sheet', 'include_summary',
+        'include_validation', 'auto_filter', 'freeze_panes', 'write_only', 'streaming_input',
+        'writer', 'output_format', 'export_date'
+    ]
+    VALIDATE_OPTIONS = ['check_content', 'max_rows', 'sample_every', 'max_errors']
+    MAX_HEADER_LINES = 100
+    
+    def __init__(self, processor: MaterialExcelProcessor, output_dir: str = 'exports',
+                 workers: Optional[int] = None, queue_size: int = 100,
+                 input_root: Optional[str] = None, token: Optional[str] = None,
+                 max_body_bytes: int = 64 << 20, max_jobs: int = 1000, job_ttl: float = 24 * 3600):
+        self.processor = processor
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.input_root = os.path.realpath(input_root) if input_root else None
+        # 未指定存取權杖時於啟動時產生，並記錄於日誌
+        self.token_generated = not token
+        self.token = token or secrets.token_urlsafe(32)
+        self.max_body_bytes = max_body_bytes
+        self.max_jobs = max_jobs
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self.queue = None
+        self.executor = None
+    
+    def serve(self, host: str = '127.0.0.1', port: int = 8765, socket_path: Optional[str] = None):
+        """啟動服務（阻塞直到中斷）"""
+        try:
+            asyncio.run(self._serve(host, port, socket_path))
+        except KeyboardInterrupt:
+            logger.info("匯出服務已停止")
+    
+    async def _serve(self, host: str, port: int, socket_path: Optional[str]):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        
+        # 同時執行的工作數等於程序池大小，避免超額使用主機資源
+        runners = [asyncio.create_task(self._run_jobs()) for _ in range(self.workers)]
+        runners.append(asyncio.create_task(self._prune_periodically()))
+        
+        if socket_path:
+            server = await asyncio.start_unix_server(self._handle_connection, path=socket_path)
+            logger.info(f"匯出服務啟動: unix:{socket_path} ({self.workers} 個工作程序)")
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            logger.info(f"匯出服務啟動: http://{host}:{port} ({self.workers} 個工作程序)")
+        if self.token_generated:
+            logger.info(f"存取權杖（未指定 --token，已自動產生）: {self.token}")
+        if self.input_root is None:
+            logger.info("未設定輸入根目錄，只接受以 data 內嵌的申請資料")
+        
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for runner in runners:
+                runner.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+    
+    def submit(self, request: Dict) -> Dict:
+        """
+        建立工作並排入佇列
+        
+        Raises:
+            ValueError: 工作內容無效
+            asyncio.QueueFull: 佇列已滿
+        """
+        action = request.get('action')
+        if action not in self.ACTIONS:
+            raise ValueError(f"不支援的動作: {action}")
+        
+        params = {}
+        if action == 'convert':
+            if 'data' in request:
+                # 內嵌資料必須為陣列：字串會被當成伺服器上的檔案路徑
+                if not isinstance(request['data'], list):
+                    raise ValueError('data 必須為申請資料陣列')
+                params['data'] = request['data']
+            elif 'input' in request:
+                params['input'] = self._resolve_input_paths([request['input']])[0]
+            else:
+                raise ValueError('convert 需要 input 或 data')
+        elif action == 'merge':
+            if not request.get('files'):
+                raise ValueError('merge 需要 files')
+            params['files'] = self._resolve_input_paths(request['files'])
+        else:
+            if not request.get('files') and 'input' not in request:
+                raise ValueError('validate 需要 input 或 files')
+            params['files'] = self._resolve_input_paths(request.get('files') or [request['input']])
+            options = request.get('options') or {}
+            if not isinstance(options, dict):
+                raise ValueError('options 必須為物件')
+            unknown_options = set(options) - set(self.VALIDATE_OPTIONS)
+            if unknown_options:
+                raise ValueError(f"未知的驗證選項: {sorted(unknown_options)}")
+            # 選項值在排入佇列前檢查，無效時與其他請求錯誤一樣回傳400
+            self.processor._check_validation_options(
+                options.get('max_rows'), options.get('sample_every', 1), options.get('max_errors')
+            )
+            params['options'] = options
+        
+        config_overrides = request.get('config') or {}
+        unknown_keys = set(config_overrides) - set(self.CONFIG_KEYS)
+        if unknown_keys:
+            raise ValueError(f"不可覆寫的配置項目: {sorted(unknown_keys)}")
+        
+        self._prune_jobs()
+        if len(self.jobs) >= self.max_jobs:
+            raise asyncio.QueueFull()
+        
+        # 工作本身不再開啟程序池，平行度由服務的程序池控制
+        config = dict(self.processor.config, **config_overrides, workers=1)
+        
+        job_id = uuid.uuid4().hex
+        output_path = None
+        if action in self.DEFAULT_OUTPUT_NAMES:
+            output_name = os.path.basename(request.get('output_name') or self.DEFAULT_OUTPUT_NAMES[action])
+            output_path = os.path.join(self.output_dir, job_id, output_name)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        
+        job = {
+            'id': job_id,
+            'action': action,
+            'status': 'queued',
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+            'config': config,
+            'params': params,
+            'output_path': output_path,
+            'finished_ts': None
+        }
+        self.queue.put_nowait(job)
+        self.jobs[job_id] = job
+        logger.info(f"排入工作 {job_id}: {action}")
+        return job
+    
+    async def _run_jobs(self):
+        """從佇列取出工作並交由程序池執行"""
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job['status'] = 'running'
+            job['started_at'] = datetime.now().isoformat(timespec='seconds')
+            try:
+                job['result'] = await loop.run_in_executor(
+                    self.executor, _run_service_job,
+                    job['config'], job['action'], job['params'], job['output_path']
+                )
+                job['status'] = 'done'
+                logger.info(f"✅ 工作完成 {job['id']}")
+            except Exception as e:
+                job['status'] = 'failed'
+                job['error'] = str(e)
+                logger.error(f"工作失敗 {job['id']}: {e}")
+            finally:
+                job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+                job['finished_ts'] = time.time()
+                # 工作參數可能含大量內嵌資料，完成後即釋放
+                job['params'] = None
+                self.queue.task_done()
+    
+    def _resolve_input_paths(self, patterns: Any) -> List[str]:
+        """
+        將工作的輸入路徑解析為輸入根目錄內的檔案
+        
+        路徑須為相對於 input_root 的字串（可含萬用字元）；解析符號連結後
+        位於根目錄以外的檔案一律拒絕（萬用字元的比對結果則略過）。
+        
+        Raises:
+            ValueError: 未設定輸入根目錄、路徑無效或超出根目錄、找不到檔案
+        """
+        if self.input_root is None:
+            raise ValueError('服務未設定輸入根目錄（--input-root），只接受以 data 內嵌的申請資料')
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        if not isinstance(patterns, list) or not all(isinstance(pattern, str) and pattern for pattern in patterns):
+            raise ValueError('輸入路徑必須為字串或字串列表')
+        
+        root = self.input_root
+        file_paths = []
+        for pattern in patterns:
+            if os.path.isabs(pattern):
+                raise ValueError(f"輸入路徑必須為相對於輸入根目錄的路徑: {pattern}")
+            full_pattern = os.path.join(root, pattern)
+            magic = glob.has_magic(pattern)
+            for match in sorted(glob.glob(full_pattern)) if magic else [full_pattern]:
+                file_path = os.path.realpath(match)
+                if os.path.commonpath([root, file_path]) != root:
+                    if magic:
+                        continue
+                    raise ValueError(f"輸入路徑超出輸入根目錄: {pattern}")
+                if not os.path.isfile(file_path):
+                    if magic:
+                        continue
+                    raise ValueError(f"找不到輸入檔案: {pattern}")
+                if file_path not in file_paths:
+                    file_paths.append(file_path)
+        
+        if not file_paths:
+            raise ValueError(f"沒有符合的輸入檔案: {patterns}")
+        return file_paths
+    
+    def _prune_jobs(self):
+        """清除已結束超過 job_ttl 秒的工作，工作數超過 max_jobs 時再從最早結束的開始清除"""
+        finished = sorted(
+            (job for job in self.jobs.values() if job['finished_ts'] is not None),
+            key=lambda job: job['finished_ts']
+        )
+        cutoff = time.time() - self.job_ttl
+        expired = [job for job in finished if job['finished_ts'] < cutoff]
+        # 保留一個位置給即將排入的工作
+        excess = len(self.jobs) - len(expired) - self.max_jobs + 1
+        if excess > 0:
+            expired.extend(finished[len(expired):len(expired) + excess])
+        
+        for job in expired:
+            del self.jobs[job['id']]
+            if job['output_path']:
+                # 輸出檔（含下載時產生的zip）都在以工作id命名的資料夾內
+                shutil.rmtree(os.path.dirname(job['output_path']), ignore_errors=True)
+        if expired:
+            logger.info(f"已清除 {len(expired)} 個已結束的工作")
+    
+    async def _prune_periodically(self, interval: float = 60):
+        """定期清除過期的工作與輸出檔"""
+        while True:
+            await asyncio.sleep(min(interval, self.job_ttl))
+            self._prune_jobs()
+    
+    def _job_view(self, job: Dict) -> Dict:
+        """工作狀態的對外表示"""
+        return {
+            key: job[key]
+            for key in ['id', 'action', 'status', 'created_at', 'started_at', 'finished_at', 'result', 'error']
+        }
+    
+    async def _handle_connection(self, reader, writer):
+        """處理單一HTTP連線（每個連線一個請求）"""
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                if len(headers) >= self.MAX_HEADER_LINES:
+                    raise ValueError('標頭數量過多')
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            
+            path = urlsplit(target).path.rstrip('/')
+            if path != '/health' and not self._authorized(headers):
+                # 未驗證的請求不讀取本文
+                await self._send_json(writer, 401, {'error': '需要有效的存取權杖（Authorization: Bearer <token>）'})
+                return
+            
+            content_length = int(headers.get('content-length') or 0)
+            if content_length < 0:
+                raise ValueError(f"Content-Length 無效: {content_length}")
+            if content_length > self.max_body_bytes:
+                await self._send_json(writer, 413, {'error': f"請求本文超過上限 {self.max_body_bytes} 位元組"})
+                return
+            body = await reader.readexactly(content_length) if content_length else b''
+            
+            await self._dispatch(writer, method, path, headers, body)
+        except (ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            await self._send_json(writer, 400, {'error': f"無效的請求: {e}"})
+        except Exception as e:
+            logger.exception("處理請求失敗")
+            await self._send_json(writer, 500, {'error': str(e)})
+        finally:
+            writer.close()
+    
+    def _authorized(self, headers: Dict[str, str]) -> bool:
+        """檢查 Authorization: Bearer 權杖（以固定時間比較）"""
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), self.token.encode())
+    
+    async def _dispatch(self, writer, method: str, path: str, headers: Dict[str, str], body: bytes):
+        """依路徑分派請求"""
+        parts = [part for part in path.split('/') if part]
+        
+        if method == 'GET' and parts == ['health']:
+            await self._send_json(writer, 200, {
+                'status': 'ok',
+                'workers': self.workers,
+                'queued': self.queue.qsize(),
+                'running': sum(1 for job in self.jobs.values() if job['status'] == 'running')
+            })
+        elif method == 'POST' and parts == ['jobs']:
+            # 只接受JSON：瀏覽器的跨站表單無法送出 application/json 而不經過預檢
+            content_type = headers.get('content-type', '').split(';', 1)[0].strip().lower()
+            if content_type != 'application/json':
+                await self._send_json(writer, 415, {'error': '請求本文必須為 application/json'})
+                return
+            try:
+                job = self.submit(json.loads(body or b'{}'))
+            except asyncio.QueueFull:
+                await self._send_json(writer, 503, {'error': '工作佇列已滿，請稍後再試'})
+                return
+            except (ValueError, TypeError, AttributeError) as e:
+                await self._send_json(writer, 400, {'error': str(e)})
+                return
+            await self._send_json(writer, 202, self._job_view(job))
+        elif method == 'GET' and parts == ['jobs']:
+            await self._send_json(writer, 200, [self._job_view(job) for job in self.jobs.values()])
+        elif method == 'GET' and len(parts) in (2, 3) and parts[0] == 'jobs' and parts[1] in self.jobs:
+            job = self.jobs[parts[1]]
+            if len(parts) == 2:
+                await self._send_json(writer, 200, self._job_view(job))
+            elif parts[2] == 'download':
+                await self._send_download(writer, job)
+            else:
+                await self._send_json(writer, 404, {'error': '找不到資源'})
+        else:
+            await self._send_json(writer, 404, {'error': '找不到資源'})
+    
+    async def _send_download(self, writer, job: Dict):
+        """傳送工作產生的檔案"""
+        if job['status'] != 'done' or job['action'] not in self.DEFAULT_OUTPUT_NAMES:
+            await self._send_json(writer, 409, {'error': f"工作沒有可下載的檔案（狀態: {job['status']}）"})
+            return
+        
+        file_path = job['result']
+        if os.path.isdir(file_path):
+            # 檔案組合壓縮為zip下載
+            if not os.path.isfile(f"{file_path}.zip"):
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, shutil.make_archive, file_path, 'zip', file_path)
+            file_path = f"{file_path}.zip"
+        
+        content_type = {
+            '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            '.zip': 'application/zip'
+        }.get(os.path.splitext(file_path)[1], 'application/octet-stream')
+        
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {os.path.getsize(file_path)}\r\n"
+            f"Content-Disposition: attachment; filename=\"{os.path.basename(file_path)}\"\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode('utf-8'))
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+    
+    async def _send_json(self, writer, status: int, payload: Any):
+        """傳送JSON回應"""
+        reasons = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+                   409: 'Conflict', 413: 'Payload Too Large', 415: 'Unsupported Media Type',
+                   500: 'Internal Server Error', 503: 'Service Unavailable'}
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        writer.write((
+            f"HTTP/1.1 {status} {reasons[status]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode('utf-8') + body)
+        await writer.drain()
+
+
+def _positive_int(value: str) -> int:
+    """命令列正整數參數"""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必須為正整數: {value}")
+    return number
 
 
 def main():
@@ -632,7 +3544,7 @@ def main():
     )
     parser.add_argument(
         'action',
-        choices=['convert', 'validate', 'merge'],
+        choices=['convert', 'validate', 'merge', 'import', 'diff', 'serve'],
         help='執行動作'
     )
     parser.add_argument(
@@ -650,34 +3562,216 @@ def main():
     parser.add_argument(
         '--files',
         nargs='+',
-        help='要合併的檔案列表（用於merge動作）'
+        help='要合併或驗證的檔案列表，可使用萬用字元如 exports/*.xlsx（用於merge/validate動作）'
+    )
+    parser.add_argument(
+        '--streaming',
+        action='store_true',
+        help='使用串流寫入模式（write-only），適合大量資料匯出（用於convert動作）'
+    )
+    parser.add_argument(
+        '--writer',
+        choices=['openpyxl', 'xlsxwriter'],
+        help='Excel寫入引擎：openpyxl（預設）或 xlsxwriter（constant_memory模式）（用於convert動作）'
+    )
+    parser.add_argument(
+        '--format',
+        dest='output_format',
+        choices=sorted(OUTPUT_EXTENSIONS),
+        help='輸出格式：xlsx（預設）、csv、tsv 或 parquet；非xlsx時各類別輸出為獨立檔案（用於convert動作）'
+    )
+    parser.add_argument(
+        '--workers',
+        type=_positive_int,
+        help='平行處理的程序數；convert時大於1輸出為多檔案組合資料夾，merge/validate時平行解析各輸入檔'
+    )
+    parser.add_argument(
+        '--streaming-input',
+        action='store_true',
+        help='逐筆串流讀取輸入並暫存至各類別暫存檔，不一次載入全部資料（用於convert動作）'
+    )
+    parser.add_argument(
+        '--manifest',
+        help='增量匯出：以SQLite清單記錄已匯出的申請，只輸出新增或變更的資料（用於convert動作）'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        help='輸出快取資料夾：相同資料與設定直接沿用先前產生的檔案（用於convert動作）'
+    )
+    parser.add_argument(
+        '--source',
+        metavar='DSN',
+        help='直接從資料庫讀取已核准申請，取代 -i（postgresql://... 或 sqlite:///路徑；用於convert動作）'
+    )
+    parser.add_argument(
+        '--chunk-rows',
+        type=_positive_int,
+        help='分塊匯出：每N筆已核准申請寫成一個檔案，中斷後重新執行即續傳（用於convert動作）'
+    )
+    parser.add_argument(
+        '--metrics',
+        action='store_true',
+        help='以結構化日誌輸出各階段耗時、每秒筆數、儲存格數與尖峰記憶體（用於convert動作）'
+    )
+    parser.add_argument(
+        '--metrics-file',
+        help='將各階段指標寫入JSON檔（用於convert動作）'
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='',
+        metavar='PSTATS',
+        help='以 cProfile 與 tracemalloc 剖析執行，可指定 pstats 輸出檔'
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='匯出服務監聽位址（用於serve動作）'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8765,
+        help='匯出服務監聽埠號（用於serve動作）'
+    )
+    parser.add_argument(
+        '--socket',
+        help='改以Unix socket提供服務（用於serve動作）'
+    )
+    parser.add_argument(
+        '--output-dir',
+        default='exports',
+        help='匯出服務的輸出資料夾（用於serve動作）'
+    )
+    parser.add_argument(
+        '--input-root',
+        help='匯出服務可讀取的輸入根目錄，工作的 input / files 限定在此目錄內；未設定時只接受內嵌資料（用於serve動作）'
+    )
+    parser.add_argument(
+        '--token',
+        help='匯出服務的存取權杖，也可用環境變數 MATERIAL_EXPORT_TOKEN 指定；未指定時啟動時自動產生（用於serve動作）'
+    )
+    parser.add_argument(
+        '--check-content',
+        action='store_true',
+        help='逐列檢查內容：必要欄位非空、尺寸重量為數值、單位在選項內（用於validate動作）'
+    )
+    parser.add_argument(
+        '--max-rows',
+        type=_positive_int,
+        help='每張工作表最多檢查內容的資料列數，筆數改由工作表尺寸資訊取得（用於validate動作）'
+    )
+    parser.add_argument(
+        '--sample-every',
+        type=_positive_int,
+        default=1,
+        help='內容檢查抽樣間隔，每N列檢查一列（用於validate動作）'
+    )
+    parser.add_argument(
+        '--max-errors',
+        type=_positive_int,
+        help='錯誤數達到上限時停止驗證（用於validate動作）'
     )
     
     args = parser.parse_args()
     
+    # 命令列選項覆寫配置
+    overrides = {}
+    if args.streaming:
+        overrides['write_only'] = True
+    if args.streaming_input:
+        overrides['streaming_input'] = True
+    if args.workers:
+        overrides['workers'] = args.workers
+    if args.writer:
+        overrides['writer'] = args.writer
+    if args.output_format:
+        overrides['output_format'] = args.output_format
+    if args.manifest:
+        overrides['manifest_path'] = args.manifest
+    if args.cache_dir:
+        overrides['cache_dir'] = args.cache_dir
+    if args.source:
+        # 資料庫來源逐批讀取並暫存至磁碟，記憶體不隨資料量成長
+        overrides['streaming_input'] = True
+    if args.chunk_rows:
+        overrides['chunk_rows'] = args.chunk_rows
+    if args.metrics:
+        overrides['metrics'] = True
+    if args.metrics_file:
+        overrides['metrics_path'] = args.metrics_file
+    
     # 建立處理器
-    processor = MaterialExcelProcessor(config_path=args.config)
+    processor = MaterialExcelProcessor(config_path=args.config, config=overrides)
+    
+    profiler = None
+    if args.profile is not None:
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
     
     try:
         if args.action == 'convert':
             # 轉換JSON為Excel
-            if not args.input:
-                print("錯誤：請指定輸入檔案 (-i)")
+            if not args.input and not args.source:
+                print("錯誤：請指定輸入檔案 (-i) 或資料庫 (--source)")
                 sys.exit(1)
             
+            json_data = args.input
+            if args.source:
+                json_data = _DatabaseSource(args.source, processor.config['db_batch_size'])
             output_path = processor.process_json_to_excel(
-                args.input,
+                json_data,
                 args.output
             )
-            print(f"✅ 轉換完成: {output_path}")
+            if output_path:
+                print(f"✅ 轉換完成: {output_path}")
+            else:
+                print("✅ 沒有新增或變更的申請，未產生檔案")
             
         elif args.action == 'validate':
             # 驗證Excel格式
-            if not args.input:
-                print("錯誤：請指定要驗證的檔案 (-i)")
+            file_paths = _expand_file_patterns(([args.input] if args.input else []) + (args.files or []))
+            if not file_paths:
+                print("錯誤：請指定要驗證的檔案 (-i 或 --files)")
                 sys.exit(1)
             
-            results = processor.validate_excel_format(args.input)
+            options = {
+                'check_content': args.check_content,
+                'max_rows': args.max_rows,
+                'sample_every': args.sample_every,
+                'max_errors': args.max_errors
+            }
+            
+            if len(file_paths) > 1:
+                # 多檔案：彙整為單一報告
+                report = processor.validate_excel_files(file_paths, **options)
+                
+                print("\n" + "="*60)
+                print(f"驗證結果（{len(file_paths)} 個檔案）")
+                print("="*60)
+                print(f"✅ 全部有效: {report['valid']}")
+                print(f"📊 資料統計: {report['summary']}")
+                
+                print("\n各檔案:")
+                for results in report['files']:
+                    status = '✅' if results['valid'] else '❌'
+                    total_rows = sum(results['summary'].values())
+                    print(f"  {status} {results['file']}: {total_rows} 筆資料, {len(results['errors'])} 個錯誤")
+                
+                if report['errors']:
+                    print(f"\n❌ 錯誤:")
+                    for error in report['errors']:
+                        print(f"  - {error}")
+                
+                if report['warnings']:
+                    print(f"\n⚠️ 警告:")
+                    for warning in report['warnings']:
+                        print(f"  - {warning}")
+                return
+            
+            results = processor.validate_excel_format(file_paths[0], **options)
             
             print("\n" + "="*60)
             print("驗證結果")
@@ -701,7 +3795,8 @@ def main():
             
         elif args.action == 'merge':
             # 合併多個Excel檔案
-            if not args.files or len(args.files) < 2:
+            file_paths = _expand_file_patterns(args.files or [])
+            if len(file_paths) < 2:
                 print("錯誤：請指定至少2個要合併的檔案 (--files)")
                 sys.exit(1)
             
@@ -710,15 +3805,56 @@ def main():
                 args.output = f"Merged_{timestamp}.xlsx"
             
             output_path = processor.merge_excel_files(
-                args.files,
+                file_paths,
                 args.output
             )
             print(f"✅ 合併完成: {output_path}")
         
+        elif args.action == 'import':
+            # 匯入Excel為申請資料（JSON Lines）
+            if not args.input:
+                print("錯誤：請指定要匯入的Excel檔案 (-i)")
+                sys.exit(1)
+            
+            output_path = processor.import_excel_to_json(args.input, args.output)
+            print(f"✅ 匯入完成: {output_path}")
+        
+        elif args.action == 'diff':
+            # 比對兩個匯出檔
+            file_paths = _expand_file_patterns(args.files or [])
+            if len(file_paths) != 2:
+                print("錯誤：請以 --files 指定舊檔與新檔兩個檔案")
+                sys.exit(1)
+            
+            report = processor.diff_excel_files(file_paths[0], file_paths[1], args.output)
+            summary = report['summary']
+            print("\n" + "="*60)
+            print("差異比對結果")
+            print("="*60)
+            print(f"📊 舊檔 {summary['old_rows']} 筆, 新檔 {summary['new_rows']} 筆")
+            print(f"➕ 新增: {summary['added']}  ➖ 刪除: {summary['removed']}  "
+                  f"✏️ 變更: {summary['changed']}  未變更: {summary['unchanged']}")
+            for item in report['changed'][:20]:
+                print(f"  {item['key']} ({item['sheet']}): {', '.join(item['columns'])}")
+            if len(report['changed']) > 20:
+                print(f"  ...（共 {len(report['changed'])} 筆變更，完整內容請以 -o 輸出報告）")
+        
+        elif args.action == 'serve':
+            # 啟動常駐匯出服務
+            service = MaterialExportService(
+                processor, output_dir=args.output_dir, workers=args.workers,
+                input_root=args.input_root, token=args.token or os.environ.get('MATERIAL_EXPORT_TOKEN')
+            )
+            service.serve(args.host, args.port, args.socket)
+        
     except Exception as e:
         print(f"❌ 錯誤: {e}")
         logger.exception("處理失敗")
         sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _print_profile(profiler, args.profile or None)
 
 
 if __name__ == "__main__":
@@ -803,6 +3939,7 @@ if __name__ == "__main__":
         
         print("\n使用說明:")
         print("python excel_processor.py convert -i input.json -o output.xlsx")
+        print("python excel_processor.py convert -i input.json -o output.xlsx --streaming")
         print("python excel_processor.py validate -i file.xlsx")
         print("python excel_processor.py merge --files file1.xlsx file2.xlsx -o merged.xlsx")
     else: